@@ -0,0 +1,103 @@
+"""
+Single-flight: requests idênticos que chegam juntos compartilham uma consulta.
+
+O primeiro request de uma chave (rota + parâmetros normalizados) executa; os
+que chegam enquanto ele está em andamento esperam e recebem o mesmo resultado
+(ou a mesma exceção). Não é cache: terminada a consulta, a chave sai e o
+próximo request consulta de novo.
+
+As rotas síncronas do FastAPI rodam no threadpool, por isso threading.
+API_SINGLE_FLIGHT=0 desliga.
+"""
+
+import functools
+import inspect
+import os
+import threading
+from collections import Counter
+
+HABILITADO = os.getenv("API_SINGLE_FLIGHT", "1") == "1"
+
+
+class _Chamada:
+    __slots__ = ("pronto", "resultado", "erro")
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento: dict = {}
+        self.executadas: Counter = Counter()
+        self.compartilhadas: Counter = Counter()
+
+    def executar(self, chave: tuple, fn):
+        with self._lock:
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_andamento[chave] = _Chamada()
+                self.executadas[chave[0]] += 1
+            else:
+                self.compartilhadas[chave[0]] += 1
+
+        if not lider:
+            chamada.pronto.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = fn()
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            chamada.pronto.set()
+
+    def como_dict(self) -> dict:
+        with self._lock:
+            rotas = sorted(set(self.executadas) | set(self.compartilhadas))
+            return {
+                "habilitado": HABILITADO,
+                "em_andamento": len(self._em_andamento),
+                "por_rota": {
+                    r: {"executadas": self.executadas[r], "compartilhadas": self.compartilhadas[r]}
+                    for r in rotas
+                },
+            }
+
+
+single_flight = SingleFlight()
+
+
+def coalescer(nome: str, normalizar=None):
+    """
+    Decorator de rota. `normalizar(**kwargs)` devolve os parâmetros que entram
+    na chave (ex.: CNPJ só com dígitos); sem ele, usa todos os kwargs.
+    """
+
+    def deco(fn):
+        assinatura = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not HABILITADO:
+                return fn(*args, **kwargs)
+            ligados = assinatura.bind(*args, **kwargs)
+            ligados.apply_defaults()
+            params = ligados.arguments
+            valores = normalizar(**params) if normalizar else params
+            chave = (nome, tuple(sorted(valores.items())))
+            return single_flight.executar(chave, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return deco
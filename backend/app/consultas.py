@@ -0,0 +1,241 @@
+"""
+SQL das rotas da API num lugar só + execução via prepared statements.
+
+Cada consulta tem um nome. Com DB_PREPARED_STATEMENTS=1 a primeira execução
+numa conexão faz PREPARE e as seguintes só EXECUTE: o Postgres não precisa
+parsear/planejar de novo o mesmo SQL a cada request. Os statements ficam num
+LRU por conexão (DB_PREPARED_CACHE_SIZE); o que sai do LRU leva DEALLOCATE.
+
+Desligado (DB_PREPARED_STATEMENTS=0) cai no conn.execute(text(...)) de
+sempre. O padrão é desligado quando o host é um pooler em modo transação
+(ex.: endpoint "-pooler" do Neon), onde PREPARE não sobrevive entre requests,
+e sempre desligado com DB_MOTOR=duckdb.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+from . import perfil
+
+# postgres (padrão) ou duckdb (Parquet local, ver motor_duckdb.py)
+MOTOR = os.getenv("DB_MOTOR", "postgres").lower()
+
+_PADRAO = "0" if "-pooler" in os.getenv("POSTGRES_HOST", "") else "1"
+# PREPARE/EXECUTE é SQL do Postgres; no DuckDB não se aplica
+PREPARED_STATEMENTS = MOTOR == "postgres" and os.getenv("DB_PREPARED_STATEMENTS", _PADRAO) == "1"
+TAMANHO_CACHE = int(os.getenv("DB_PREPARED_CACHE_SIZE", "64"))
+
+OPERADORA_POR_CNPJ = """
+SELECT cnpj, razao_social, uf, modalidade
+FROM dim_operadora
+WHERE cnpj = :cnpj
+"""
+
+ESTATISTICAS_TOTAIS = """
+SELECT
+  COALESCE(SUM(total_despesas), 0) AS total_despesas,
+  COALESCE(AVG(total_despesas), 0) AS media_despesas
+FROM despesas_agregadas
+"""
+
+ESTATISTICAS_TOP5 = """
+SELECT cnpj, razao_social, uf, modalidade, total_despesas
+FROM operadora_resumo
+ORDER BY rank_nacional, cnpj
+LIMIT 5
+"""
+
+TOP_OPERADORAS = """
+SELECT cnpj, razao_social, uf, modalidade, total_despesas
+FROM operadora_resumo
+ORDER BY rank_nacional, cnpj
+LIMIT :top
+"""
+
+ESTATISTICAS_UF = """
+SELECT
+  d.uf,
+  SUM(f.valor_despesas) AS total_uf
+FROM fato_despesas_consolidadas f
+JOIN dim_operadora d ON d.cnpj = f.cnpj
+WHERE d.uf IS NOT NULL AND d.uf <> ''
+GROUP BY d.uf
+ORDER BY total_uf DESC
+"""
+
+
+def sql_listar_operadoras(where: str, order_by: str) -> str:
+    # where/order_by vêm de listas fechadas em main.py; valores só como :parâmetros
+    return f"""
+SELECT
+  cnpj, razao_social, uf, modalidade,
+  total_despesas, ultimo_ano, ultimo_trimestre,
+  valor_ultimo_trimestre, variacao_trimestral,
+  rank_nacional, rank_uf
+FROM operadora_resumo
+{where}
+ORDER BY {order_by}, cnpj
+LIMIT :limit OFFSET :offset
+"""
+
+
+def sql_contar_operadoras(where: str) -> str:
+    return f"SELECT COUNT(*) FROM operadora_resumo {where}"
+
+
+def sql_historico_despesas(where: str) -> str:
+    return f"""
+SELECT ano, trimestre, valor_despesas
+FROM operadora_trimestre
+{where}
+ORDER BY ano, trimestre
+"""
+
+
+_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+
+
+def _posicional(sql: str) -> tuple[str, list[str]]:
+    """':cnpj' -> '$1' (PREPARE só aceita parâmetros posicionais)."""
+    nomes: list[str] = []
+
+    def trocar(m):
+        if m.group(1) not in nomes:
+            nomes.append(m.group(1))
+        return f"${nomes.index(m.group(1)) + 1}"
+
+    return _PARAM.sub(trocar, sql), nomes
+
+
+class _Estatisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.descartes = 0
+        self.repreparos = 0
+
+    def registrar(self, nome: str, hit: bool):
+        with self._lock:
+            (self.hits if hit else self.misses)[nome] += 1
+
+    def contar(self, campo: str):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def como_dict(self) -> dict:
+        with self._lock:
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            return {
+                "motor": MOTOR,
+                "habilitado": PREPARED_STATEMENTS,
+                "tamanho_cache": TAMANHO_CACHE,
+                "hits": hits,
+                "misses": misses,
+                "taxa_acerto": round(hits / (hits + misses), 4) if hits + misses else None,
+                "descartes": self.descartes,
+                "repreparos": self.repreparos,
+                "por_consulta": {
+                    nome: {"hits": self.hits[nome], "misses": self.misses[nome]}
+                    for nome in sorted(set(self.hits) | set(self.misses))
+                },
+            }
+
+
+estatisticas = _Estatisticas()
+
+
+def registrar_engine(engine):
+    """LRU novo a cada conexão física (os PREPARE morrem junto com a sessão)."""
+
+    @event.listens_for(engine, "connect")
+    def _nova_conexao(dbapi_connection, connection_record):
+        connection_record.info["prepared"] = OrderedDict()
+
+
+def _preparar(conn, cache: OrderedDict, sql: str) -> tuple[str, list[str]]:
+    sql_pos, nomes = _posicional(sql)
+    stmt = "q_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+    conn.exec_driver_sql(f"PREPARE {stmt} AS {sql_pos}")
+    cache[sql] = (stmt, nomes)
+    while len(cache) > TAMANHO_CACHE:
+        _, (velho, _) = cache.popitem(last=False)
+        conn.exec_driver_sql(f"DEALLOCATE {velho}")
+        estatisticas.contar("descartes")
+    return stmt, nomes
+
+
+def _executar_preparado(conn, stmt: str, nomes: list[str], params: dict):
+    if not nomes:
+        return conn.exec_driver_sql(f"EXECUTE {stmt}")
+    args = ", ".join(f"%({n})s" for n in nomes)
+    return conn.exec_driver_sql(f"EXECUTE {stmt}({args})", {n: params[n] for n in nomes})
+
+
+def executar(conn, nome: str, sql: str, params: dict | None = None):
+    """Roda `sql` (com :parâmetros) e devolve o Result, igual ao conn.execute."""
+    params = params or {}
+    p = perfil.atual()
+    if p is None:
+        return _executar(conn, nome, sql, params)
+
+    # request perfilado (perfil.py): tempo por nome de consulta
+    p.registrar_thread()
+    inicio = time.perf_counter()
+    try:
+        return _executar(conn, nome, sql, params)
+    finally:
+        p.registrar_consulta(nome, (time.perf_counter() - inicio) * 1000)
+
+
+def _executar(conn, nome: str, sql: str, params: dict):
+    if not PREPARED_STATEMENTS:
+        return conn.execute(text(sql), params)
+
+    cache = conn.connection.info.setdefault("prepared", OrderedDict())
+    if sql in cache:
+        cache.move_to_end(sql)
+        stmt, nomes = cache[sql]
+        estatisticas.registrar(nome, hit=True)
+    else:
+        stmt, nomes = _preparar(conn, cache, sql)
+        estatisticas.registrar(nome, hit=False)
+
+    try:
+        return _executar_preparado(conn, stmt, nomes, params)
+    except DBAPIError as e:
+        # o import troca as tabelas; se o formato do resultado mudou, o plano
+        # guardado não serve mais: refaz o PREPARE uma vez
+        if "cached plan must not change result type" not in str(e.orig):
+            raise
+        conn.rollback()
+        conn.exec_driver_sql(f"DEALLOCATE {stmt}")
+        del cache[sql]
+        stmt, nomes = _preparar(conn, cache, sql)
+        estatisticas.contar("repreparos")
+        return _executar_preparado(conn, stmt, nomes, params)
+
+
+# Rodadas na subida da API (subida.py) em cada conexão aquecida: PREPARE já
+# feito e páginas no cache do banco antes do primeiro request. O SQL é o mesmo
+# texto que main.py monta para o Dashboard e a primeira página de /api/operadoras.
+CONSULTAS_QUENTES = [
+    ("estatisticas_totais", ESTATISTICAS_TOTAIS, {}),
+    ("top_operadoras", TOP_OPERADORAS, {"top": 5}),
+    ("estatisticas_top5", ESTATISTICAS_TOP5, {}),
+    ("estatisticas_uf", ESTATISTICAS_UF, {}),
+    ("contar_operadoras", sql_contar_operadoras("WHERE 1=1"), {}),
+    (
+        "listar_operadoras",
+        sql_listar_operadoras("WHERE 1=1", "razao_social ASC NULLS LAST"),
+        {"limit": 20, "offset": 0},
+    ),
+]
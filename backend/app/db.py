@@ -1,21 +1,73 @@
 import os
+import threading
+from pathlib import Path
 from sqlalchemy import create_engine
 
+from . import perfil
+from .consultas import MOTOR, registrar_engine
+
 PG_HOST = os.getenv("POSTGRES_HOST", "localhost")
 PG_PORT = os.getenv("POSTGRES_PORT", "5432")
 PG_DB = os.getenv("POSTGRES_DB", "ans_db")
 PG_USER = os.getenv("POSTGRES_USER", "postgres")
 PG_PASS = os.getenv("POSTGRES_PASSWORD")
 
-if not PG_PASS:
-    raise RuntimeError("POSTGRES_PASSWORD não definido (env var).")
-
-DATABASE_URL = (
-    f"postgresql+psycopg2://{PG_USER}:{PG_PASS}@{PG_HOST}:{PG_PORT}/{PG_DB}"
-    f"?sslmode=require"
+# DB_MOTOR=duckdb: Parquet gerado por etl/exportar_parquet.py (padrão: data/output/parquet da raiz do repo)
+PARQUET_DIR = Path(
+    os.getenv("DUCKDB_PARQUET_DIR", Path(__file__).resolve().parents[2] / "data" / "output" / "parquet")
 )
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-)
+
+def criar_engine_postgres():
+    if not PG_PASS:
+        raise RuntimeError("POSTGRES_PASSWORD não definido (env var).")
+
+    database_url = (
+        f"postgresql+psycopg2://{PG_USER}:{PG_PASS}@{PG_HOST}:{PG_PORT}/{PG_DB}"
+        f"?sslmode=require"
+    )
+    engine = create_engine(
+        database_url,
+        pool_pre_ping=True,
+    )
+    registrar_engine(engine)
+    if perfil.HABILITADO:
+        perfil.instrumentar(engine)
+    return engine
+
+
+def criar_engine_duckdb():
+    from .motor_duckdb import MotorDuckDB
+
+    return MotorDuckDB(PARQUET_DIR)
+
+
+MOTORES = {"postgres": criar_engine_postgres, "duckdb": criar_engine_duckdb}
+
+if MOTOR not in MOTORES:
+    raise RuntimeError(f"DB_MOTOR inválido: {MOTOR}. Use: {', '.join(MOTORES)}")
+
+# criado no primeiro uso (a subida da API, ver subida.py), não no import
+_engine = None
+_lock = threading.Lock()
+
+
+def obter_engine():
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = MOTORES[MOTOR]()
+    return _engine
+
+
+def conectar():
+    return obter_engine().connect()
+
+
+def fechar():
+    global _engine
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
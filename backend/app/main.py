@@ -1,10 +1,19 @@
-from fastapi import FastAPI, Query, HTTPException
+import time
+
+_INICIO_IMPORT = time.perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import Depends, FastAPI, Header, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
-from .db import engine
+from . import consultas, perfil
+from .coalescencia import coalescer, single_flight
+from .db import conectar
+from .subida import lifespan, subida
+import contextvars
+import os
 import re
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,6 +24,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# perfil sob demanda (API_PERFIL_TOKEN); sem token o middleware nem entra
+if perfil.HABILITADO:
+    app.add_middleware(perfil.PerfilMiddleware)
+
 @app.get("/")
 def root():
     return {"ok": True}
@@ -23,33 +36,76 @@ def root():
 def health():
     return {"status": "ok"}
 
+# rank_* são INTEGER no banco (com PREPARE o parâmetro herda o tipo)
+MAX_INT4 = 2**31 - 1
+
+# ordenar=... -> coluna de operadora_resumo (lista fechada: entra direto no SQL)
+ORDENACAO_OPERADORAS = {
+    "razao_social": "razao_social",
+    "total_despesas": "total_despesas",
+    "valor_ultimo_trimestre": "valor_ultimo_trimestre",
+    "variacao_trimestral": "variacao_trimestral",
+    "rank_nacional": "rank_nacional",
+    "rank_uf": "uf, rank_uf",
+}
+
 @app.get("/api/operadoras")
 def listar_operadoras(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: str | None = Query(None, description="Busca por CNPJ ou Razao Social"),
+    ordenar: str = Query("razao_social", description=f"Uma de: {', '.join(ORDENACAO_OPERADORAS)}"),
+    ordem: str = Query("asc", pattern="^(asc|desc)$"),
+    uf: str | None = Query(None, min_length=2, max_length=2),
+    modalidade: str | None = Query(None),
+    total_min: float | None = Query(None, description="Despesa total mínima"),
+    total_max: float | None = Query(None, description="Despesa total máxima"),
+    variacao_min: float | None = Query(None, description="Variação trimestral mínima (0.1 = +10%)"),
+    variacao_max: float | None = Query(None, description="Variação trimestral máxima"),
+    rank_max: int | None = Query(None, ge=1, le=MAX_INT4, description="Só o top N nacional"),
+    rank_uf_max: int | None = Query(None, ge=1, le=MAX_INT4, description="Só o top N de cada UF"),
 ):
+    if ordenar not in ORDENACAO_OPERADORAS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"ordenar inválido: {ordenar}. Use: {', '.join(ORDENACAO_OPERADORAS)}",
+        )
     offset = (page - 1) * limit
 
-    with engine.connect() as conn:
-        base = "FROM dim_operadora WHERE 1=1"
+    with conectar() as conn:
+        where = "WHERE 1=1"
         params: dict = {}
 
         if search:
-            base += " AND (cnpj ILIKE :s OR razao_social ILIKE :s)"
+            where += " AND (cnpj ILIKE :s OR razao_social ILIKE :s)"
             params["s"] = f"%{search}%"
 
-        total = conn.execute(text(f"SELECT COUNT(*) {base}"), params).scalar_one()
-
-        rows = conn.execute(
-            text(
-                f"""
-                SELECT cnpj, razao_social, uf, modalidade
-                {base}
-                ORDER BY razao_social
-                LIMIT :limit OFFSET :offset
-                """
-            ),
+        filtros = [
+            ("uf = :uf", "uf", uf.upper() if uf else None),
+            ("modalidade = :modalidade", "modalidade", modalidade),
+            ("total_despesas >= :total_min", "total_min", total_min),
+            ("total_despesas <= :total_max", "total_max", total_max),
+            ("variacao_trimestral >= :variacao_min", "variacao_min", variacao_min),
+            ("variacao_trimestral <= :variacao_max", "variacao_max", variacao_max),
+            ("rank_nacional <= :rank_max", "rank_max", rank_max),
+            ("rank_uf <= :rank_uf_max", "rank_uf_max", rank_uf_max),
+        ]
+        for condicao, nome, valor in filtros:
+            if valor is not None:
+                where += f" AND {condicao}"
+                params[nome] = valor
+
+        total = consultas.executar(
+            conn, "contar_operadoras", consultas.sql_contar_operadoras(where), params
+        ).scalar_one()
+
+        direcao = "ASC" if ordem == "asc" else "DESC"
+        order_by = ", ".join(f"{c} {direcao} NULLS LAST" for c in ORDENACAO_OPERADORAS[ordenar].split(", "))
+
+        rows = consultas.executar(
+            conn,
+            "listar_operadoras",
+            consultas.sql_listar_operadoras(where, order_by),
             {**params, "limit": limit, "offset": offset},
         ).mappings().all()
 
@@ -60,20 +116,16 @@ def listar_operadoras(
         "total": total,
     }
 
+def _so_digitos(cnpj: str) -> str:
+    return re.sub(r"\D", "", cnpj)
+
 @app.get("/api/operadoras/{cnpj}")
 def detalhes_operadora(cnpj: str):
-    cnpj_digits = re.sub(r"\D", "", cnpj)
-
-    with engine.connect() as conn:
-        row = conn.execute(
-            text(
-                """
-                SELECT cnpj, razao_social, uf, modalidade
-                FROM dim_operadora
-                WHERE cnpj = :cnpj
-                """
-            ),
-            {"cnpj": cnpj_digits},
+    cnpj_digits = _so_digitos(cnpj)
+
+    with conectar() as conn:
+        row = consultas.executar(
+            conn, "operadora_por_cnpj", consultas.OPERADORA_POR_CNPJ, {"cnpj": cnpj_digits}
         ).mappings().first()
 
     if not row:
@@ -82,105 +134,148 @@ def detalhes_operadora(cnpj: str):
     return row
 
 @app.get("/api/operadoras/{cnpj}/despesas")
-def historico_despesas(cnpj: str):
-    cnpj_digits = re.sub(r"\D", "", cnpj)
-
-    with engine.connect() as conn:
-        rows = conn.execute(
-            text(
-                """
-                SELECT
-                  ano,
-                  trimestre,
-                  SUM(valor_despesas) AS valor_despesas
-                FROM fato_despesas_consolidadas
-                WHERE cnpj = :cnpj
-                GROUP BY ano, trimestre
-                ORDER BY ano, trimestre
-                """
-            ),
-            {"cnpj": cnpj_digits},
+@coalescer(
+    "historico_despesas",
+    lambda cnpj, ano, trimestre: {"cnpj": _so_digitos(cnpj), "ano": ano, "trimestre": trimestre},
+)
+def historico_despesas(
+    cnpj: str,
+    # limites: com PREPARE o parâmetro vira SMALLINT (tipo da coluna) e um ano
+    # fora da faixa viraria erro 500 em vez de lista vazia
+    ano: int | None = Query(None, ge=1900, le=2100, description="Filtra por ano"),
+    trimestre: int | None = Query(None, ge=1, le=4, description="Filtra por trimestre"),
+):
+    cnpj_digits = _so_digitos(cnpj)
+
+    with conectar() as conn:
+        where = "WHERE cnpj = :cnpj"
+        params: dict = {"cnpj": cnpj_digits}
+
+        if ano is not None:
+            where += " AND ano = :ano"
+            params["ano"] = ano
+        if trimestre is not None:
+            where += " AND trimestre = :trimestre"
+            params["trimestre"] = trimestre
+
+        # série já agregada por trimestre no import (operadora_trimestre)
+        rows = consultas.executar(
+            conn, "historico_despesas", consultas.sql_historico_despesas(where), params
         ).mappings().all()
 
     return rows
 
+def _operadoras_top(rows) -> list[dict]:
+    return [
+        {
+            "cnpj": r["cnpj"],
+            "razao_social": r["razao_social"],
+            "uf": r["uf"],
+            "modalidade": r["modalidade"],
+            "total_despesas": float(r["total_despesas"]),
+        }
+        for r in rows
+    ]
+
+def _despesas_por_uf(rows) -> list[dict]:
+    return [{"uf": r["uf"], "total_uf": float(r["total_uf"])} for r in rows]
+
 @app.get("/api/estatisticas")
+@coalescer("estatisticas")
 def estatisticas():
     """
     Retorna:
     - total de despesas (geral)
     - média (usando a tabela agregada por RazaoSocial+UF)
-    - top 5 operadoras por soma de despesas no fato (3 trimestres)
+    - top 5 operadoras por soma de despesas (ranking pré-calculado em operadora_resumo)
     """
-    with engine.connect() as conn:
-        row = conn.execute(
-            text(
-                """
-                SELECT
-                  COALESCE(SUM(total_despesas), 0) AS total_despesas,
-                  COALESCE(AVG(total_despesas), 0) AS media_despesas
-                FROM despesas_agregadas
-                """
-            )
-        ).mappings().one()
-
-        top5 = conn.execute(
-            text(
-                """
-                SELECT
-                  d.cnpj,
-                  d.razao_social,
-                  d.uf,
-                  d.modalidade,
-                  t.total_despesas
-                FROM dim_operadora d
-                JOIN (
-                    SELECT cnpj, SUM(valor_despesas) AS total_despesas
-                    FROM fato_despesas_consolidadas
-                    GROUP BY cnpj
-                    ORDER BY total_despesas DESC
-                    LIMIT 5
-                ) t ON t.cnpj = d.cnpj
-                ORDER BY t.total_despesas DESC
-                """
-            )
-        ).mappings().all()
+    with conectar() as conn:
+        row = consultas.executar(conn, "estatisticas_totais", consultas.ESTATISTICAS_TOTAIS).mappings().one()
+        top5 = consultas.executar(conn, "estatisticas_top5", consultas.ESTATISTICAS_TOP5).mappings().all()
 
     return {
         "total_despesas": float(row["total_despesas"]),
         "media_despesas": float(row["media_despesas"]),
-        "top5_operadoras": [
-            {
-                "cnpj": r["cnpj"],
-                "razao_social": r["razao_social"],
-                "uf": r["uf"],
-                "modalidade": r["modalidade"],
-                "total_despesas": float(r["total_despesas"]),
-            }
-            for r in top5
-        ],
+        "top5_operadoras": _operadoras_top(top5),
     }
 
 @app.get("/api/estatisticas/uf")
+@coalescer("estatisticas_uf")
 def estatisticas_por_uf():
     """
     Retorna distribuição de despesas por UF:
     [{ "uf": "SP", "total_uf": 123.45 }, ...]
     """
-    with engine.connect() as conn:
-        rows = conn.execute(
-            text(
-                """
-                SELECT
-                  d.uf,
-                  SUM(f.valor_despesas) AS total_uf
-                FROM fato_despesas_consolidadas f
-                JOIN dim_operadora d ON d.cnpj = f.cnpj
-                WHERE d.uf IS NOT NULL AND d.uf <> ''
-                GROUP BY d.uf
-                ORDER BY total_uf DESC
-                """
-            )
-        ).mappings().all()
+    with conectar() as conn:
+        rows = consultas.executar(conn, "estatisticas_uf", consultas.ESTATISTICAS_UF).mappings().all()
 
-    return [{"uf": r["uf"], "total_uf": float(r["total_uf"])} for r in rows]
+    return _despesas_por_uf(rows)
+
+# consultas do /api/dashboard rodam em paralelo, cada uma na sua conexão do pool
+_consultas_dashboard = ThreadPoolExecutor(
+    max_workers=int(os.getenv("API_DASHBOARD_WORKERS", "6")), thread_name_prefix="dashboard"
+)
+
+def _consultar(nome: str, sql: str, params: dict | None = None):
+    with conectar() as conn:
+        return consultas.executar(conn, nome, sql, params).mappings().all()
+
+def _submeter(nome: str, sql: str, params: dict | None = None):
+    # copy_context: a consulta na outra thread continua no perfil do request
+    return _consultas_dashboard.submit(contextvars.copy_context().run, _consultar, nome, sql, params)
+
+@app.get("/api/dashboard")
+@coalescer("dashboard")
+def dashboard(top: int = Query(5, ge=1, le=50, description="Tamanho do ranking de operadoras")):
+    """
+    Tudo o que o Dashboard mostra num request só: total, média, top N e
+    despesas por UF (mesmos números de /api/estatisticas e /api/estatisticas/uf).
+    As três consultas rodam ao mesmo tempo; o tempo do request fica perto do da
+    mais lenta em vez da soma.
+    """
+    totais = _submeter("estatisticas_totais", consultas.ESTATISTICAS_TOTAIS)
+    ranking = _submeter("top_operadoras", consultas.TOP_OPERADORAS, {"top": top})
+    por_uf = _submeter("estatisticas_uf", consultas.ESTATISTICAS_UF)
+
+    row = totais.result()[0]
+    return {
+        "total_despesas": float(row["total_despesas"]),
+        "media_despesas": float(row["media_despesas"]),
+        "top_operadoras": _operadoras_top(ranking.result()),
+        "por_uf": _despesas_por_uf(por_uf.result()),
+    }
+
+def _exigir_token(
+    x_perfil: str | None = Header(None),
+    token: str | None = Query(None, alias="perfil"),
+):
+    # /api/diagnostico/* expõe detalhes internos (SQL, erros da subida com host
+    # do banco): só com o token de API_PERFIL_TOKEN, no header X-Perfil ou em
+    # ?perfil=. Sem token válido a rota "não existe" (404)
+    if not perfil.autorizado(x_perfil or token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/api/diagnostico/subida", dependencies=[Depends(_exigir_token)])
+def diagnostico_subida():
+    """Tempo de cada fase da subida (importação, engine, aquecimento do pool, primar)."""
+    return subida.como_dict()
+
+@app.get("/api/diagnostico/consultas", dependencies=[Depends(_exigir_token)])
+def diagnostico_consultas():
+    """Hits/misses do cache de prepared statements e requests coalescidos (single-flight)."""
+    return {**consultas.estatisticas.como_dict(), "coalescencia": single_flight.como_dict()}
+
+@app.get("/api/diagnostico/perfis", dependencies=[Depends(_exigir_token)])
+def listar_perfis():
+    """Perfis guardados (mais recente primeiro)."""
+    return perfil.guardados.listar()
+
+@app.get("/api/diagnostico/perfis/{perfil_id}", dependencies=[Depends(_exigir_token)])
+def obter_perfil(perfil_id: str):
+    """Amostras por fase, pilhas (formato folded) e tempos de SQL de um request perfilado."""
+    p = perfil.guardados.obter(perfil_id)
+    if p is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return p.como_dict()
+
+subida.registrar("importacao", _INICIO_IMPORT)
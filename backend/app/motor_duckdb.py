@@ -0,0 +1,104 @@
+"""
+Motor DuckDB: a API servida de arquivos Parquet locais, sem Postgres.
+
+Os Parquet vêm do ETL (etl/exportar_parquet.py) e são carregados uma vez,
+na subida, para tabelas de um DuckDB em memória. Cada request pega um
+cursor próprio (DuckDB é thread-safe por cursor), então as rotas e o
+/api/dashboard em paralelo funcionam como com o pool do SQLAlchemy.
+
+Só implementa o pedaço da interface do SQLAlchemy que main.py/consultas.py
+usam: engine.connect(), conn.execute(text(sql), params) e, no resultado,
+mappings().all()/one()/first() e scalar_one().
+"""
+
+import re
+from pathlib import Path
+
+from sqlalchemy.exc import MultipleResultsFound, NoResultFound
+
+TABELAS = [
+    "dim_operadora",
+    "fato_despesas_consolidadas",
+    "despesas_agregadas",
+    "operadora_trimestre",
+    "operadora_resumo",
+]
+
+# ':cnpj' -> '$cnpj' (parâmetro nomeado do DuckDB)
+_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+
+
+class _Linhas:
+    def __init__(self, linhas: list[dict]):
+        self._linhas = linhas
+
+    def all(self) -> list[dict]:
+        return self._linhas
+
+    def first(self) -> dict | None:
+        return self._linhas[0] if self._linhas else None
+
+    def one(self) -> dict:
+        if not self._linhas:
+            raise NoResultFound("Nenhuma linha retornada")
+        if len(self._linhas) > 1:
+            raise MultipleResultsFound("Mais de uma linha retornada")
+        return self._linhas[0]
+
+
+class _Resultado:
+    def __init__(self, colunas: list[str], linhas: list[tuple]):
+        self._colunas = colunas
+        self._linhas = linhas
+
+    def mappings(self) -> _Linhas:
+        return _Linhas([dict(zip(self._colunas, linha)) for linha in self._linhas])
+
+    def scalar_one(self):
+        return _Linhas(self._linhas).one()[0]
+
+
+class _Conexao:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params: dict | None = None) -> _Resultado:
+        cur = self._cursor.execute(_PARAM.sub(r"$\1", str(sql)), params or {})
+        colunas = [d[0] for d in cur.description]
+        return _Resultado(colunas, cur.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MotorDuckDB:
+    def __init__(self, parquet_dir: Path):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise RuntimeError("DB_MOTOR=duckdb precisa do pacote duckdb (pip install duckdb).") from e
+
+        faltando = [t for t in TABELAS if not (parquet_dir / f"{t}.parquet").exists()]
+        if faltando:
+            raise RuntimeError(
+                f"Parquet não encontrado em {parquet_dir}: {', '.join(faltando)}. "
+                "Rode python etl/exportar_parquet.py (ou ajuste DUCKDB_PARQUET_DIR)."
+            )
+
+        self.parquet_dir = parquet_dir
+        self._db = duckdb.connect(":memory:")
+        for t in TABELAS:
+            arquivo = (parquet_dir / f"{t}.parquet").as_posix()
+            self._db.execute(f"CREATE TABLE {t} AS SELECT * FROM read_parquet('{arquivo}')")
+
+    def connect(self) -> _Conexao:
+        return _Conexao(self._db.cursor())
+
+    def dispose(self):
+        self._db.close()
@@ -0,0 +1,286 @@
+"""
+Perfil sob demanda de um request: onde foi o tempo de uma chamada lenta.
+
+Liga com API_PERFIL_TOKEN. Sem o token nada é instalado (nem middleware, nem
+eventos do SQLAlchemy): custo zero. Com ele, só o request que mandar o token
+no header `X-Perfil` (ou em `?perfil=`) é perfilado; os demais passam direto
+pelo middleware (uma comparação de header).
+
+Para o request perfilado:
+- amostragem de pilha (sys._current_frames) a cada API_PERFIL_INTERVALO_MS
+  nas threads do request: a do event loop (middleware/serialização) e as do
+  threadpool que abriram conexão ou rodaram consulta para ele. As amostras
+  viram pilhas no formato "folded" (flamegraph.pl/speedscope) e uma divisão
+  por fase: sql, pool, mapeamento, serializacao, espera, outros;
+- tempo de cada consulta por nome (consultas.executar) e, no Postgres, de
+  cada cursor.execute (eventos do SQLAlchemy).
+
+A resposta sai com `X-Perfil-Id` e `Server-Timing` (app e sql, visível no
+DevTools); o perfil completo fica em memória (últimos API_PERFIL_GUARDAR) e
+sai em GET /api/diagnostico/perfis/{id}, com o mesmo token.
+
+A thread do event loop é compartilhada: com requests simultâneos, amostras
+de serialização de outro request podem entrar no perfil.
+"""
+
+import asyncio
+import contextvars
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+TOKEN = os.getenv("API_PERFIL_TOKEN", "")
+HABILITADO = bool(TOKEN)
+INTERVALO_MS = float(os.getenv("API_PERFIL_INTERVALO_MS", "5"))
+GUARDAR = int(os.getenv("API_PERFIL_GUARDAR", "20"))
+PILHAS = 50
+# espera máxima pela thread de amostragem ao fim do request
+ENCERRAR_TIMEOUT_S = 1.0
+PROFUNDIDADE = 64
+
+HEADER = "x-perfil"
+PARAMETRO = "perfil"
+# as rotas de diagnóstico (que usam o mesmo token) não geram perfil novo
+ROTA_DIAGNOSTICO = "/api/diagnostico/"
+
+_atual: contextvars.ContextVar = contextvars.ContextVar("perfil", default=None)
+_ids = itertools.count(1)
+
+_APP = str(Path(__file__).resolve().parent)
+# amostra só conta se a pilha passa por código de request (o resto é thread ociosa)
+_DO_REQUEST = (_APP, f"{os.sep}fastapi{os.sep}", f"{os.sep}starlette{os.sep}")
+
+# (trecho do arquivo, funções ou None = qualquer uma) -> fase; vale o 1º
+# casamento a partir do topo da pilha
+_FASES = [
+    ("threading.py", None, "espera"),
+    (f"{os.sep}queue.py", None, "espera"),
+    (f"concurrent{os.sep}futures", None, "espera"),
+    ("motor_duckdb.py", ("execute",), "sql"),
+    ("motor_duckdb.py", None, "mapeamento"),
+    (f"sqlalchemy{os.sep}pool", None, "pool"),
+    (f"sqlalchemy{os.sep}engine{os.sep}result.py", None, "mapeamento"),
+    (f"sqlalchemy{os.sep}engine{os.sep}row.py", None, "mapeamento"),
+    (f"sqlalchemy{os.sep}engine{os.sep}cursor.py", ("fetchall", "_fetchall_impl", "all"), "mapeamento"),
+    (f"{os.sep}sqlalchemy{os.sep}", None, "sql"),
+    (f"{os.sep}psycopg2{os.sep}", None, "sql"),
+    (f"fastapi{os.sep}encoders.py", None, "serializacao"),
+    (f"{os.sep}json{os.sep}", None, "serializacao"),
+    (f"{os.sep}pydantic", None, "serializacao"),
+    (f"starlette{os.sep}responses.py", ("render", "__init__"), "serializacao"),
+    (f"fastapi{os.sep}routing.py", ("serialize_response",), "serializacao"),
+]
+
+
+def _fase(quadros: list[tuple[str, str]]) -> str:
+    for arquivo, funcao in quadros:
+        for trecho, funcoes, fase in _FASES:
+            if trecho in arquivo and (funcoes is None or funcao in funcoes):
+                return fase
+    return "outros"
+
+
+class Perfil:
+    def __init__(self, metodo: str, caminho: str):
+        self.id = f"{os.getpid()}-{next(_ids)}"
+        self.metodo = metodo
+        self.caminho = caminho
+        self.criado_em = time.time()
+        self.status: int | None = None
+        self.total_ms: float | None = None
+        self.threads: set[int] = set()
+        self.pilhas: Counter = Counter()
+        self.fases: Counter = Counter()
+        self.consultas: list[dict] = []
+        self.cursor: list[dict] = []
+        self._inicio = time.perf_counter()
+        self._parar = threading.Event()
+        self._amostrador = threading.Thread(target=self._amostrar, name="perfil", daemon=True)
+
+    def decorrido_ms(self) -> float:
+        return (time.perf_counter() - self._inicio) * 1000
+
+    def registrar_thread(self):
+        self.threads.add(threading.get_ident())
+
+    def sql_ms(self) -> float:
+        return sum(c["ms"] for c in self.consultas)
+
+    def registrar_consulta(self, nome: str, ms: float):
+        self.consultas.append({"nome": nome, "ms": round(ms, 3), "thread": threading.current_thread().name})
+
+    def registrar_cursor(self, sql: str, ms: float, linhas: int):
+        self.cursor.append({"sql": " ".join(sql.split())[:200], "ms": round(ms, 3), "linhas": linhas})
+
+    def iniciar(self):
+        self.registrar_thread()
+        self._amostrador.start()
+
+    async def encerrar(self, status: int | None):
+        # chamado no event loop: o join fica numa thread (com limite) para não
+        # travar os outros requests se o amostrador demorar a acordar
+        self._parar.set()
+        self.status = status
+        self.total_ms = round(self.decorrido_ms(), 3)
+        await asyncio.to_thread(self._amostrador.join, ENCERRAR_TIMEOUT_S)
+
+    def _amostrar(self):
+        intervalo = INTERVALO_MS / 1000
+        while not self._parar.wait(intervalo):
+            quadros_por_thread = sys._current_frames()
+            if self._parar.is_set():
+                # a thread do loop já está em encerrar(): não é tempo do request
+                return
+            for tid in tuple(self.threads):
+                quadro = quadros_por_thread.get(tid)
+                quadros = []
+                while quadro is not None and len(quadros) < PROFUNDIDADE:
+                    quadros.append((quadro.f_code.co_filename, quadro.f_code.co_name))
+                    quadro = quadro.f_back
+                if not any(t in arquivo for arquivo, _ in quadros for t in _DO_REQUEST):
+                    continue
+                self.fases[_fase(quadros)] += 1
+                self.pilhas[";".join(f"{Path(a).name}:{f}" for a, f in reversed(quadros))] += 1
+
+    def resumo(self) -> dict:
+        return {
+            "id": self.id,
+            "metodo": self.metodo,
+            "caminho": self.caminho,
+            "status": self.status,
+            "total_ms": self.total_ms,
+        }
+
+    def como_dict(self) -> dict:
+        amostras = sum(self.fases.values())
+        return {
+            **self.resumo(),
+            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.criado_em)),
+            "intervalo_ms": INTERVALO_MS,
+            "amostras": amostras,
+            # amostras * intervalo: estimativa (várias threads somam acima do total)
+            "fases": {
+                fase: {"amostras": n, "ms_estimado": round(n * INTERVALO_MS, 1)}
+                for fase, n in self.fases.most_common()
+            },
+            "sql_ms": round(self.sql_ms(), 3),
+            "consultas": self.consultas,
+            "cursor": self.cursor,
+            "pilhas": [{"pilha": p, "amostras": n} for p, n in self.pilhas.most_common(PILHAS)],
+        }
+
+
+class _Guardados:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._perfis: OrderedDict[str, Perfil] = OrderedDict()
+
+    def guardar(self, perfil: Perfil):
+        with self._lock:
+            self._perfis[perfil.id] = perfil
+            while len(self._perfis) > GUARDAR:
+                self._perfis.popitem(last=False)
+
+    def obter(self, perfil_id: str) -> Perfil | None:
+        with self._lock:
+            return self._perfis.get(perfil_id)
+
+    def listar(self) -> list[dict]:
+        with self._lock:
+            return [p.resumo() for p in reversed(self._perfis.values())]
+
+
+guardados = _Guardados()
+
+
+def autorizado(token: str | None) -> bool:
+    return HABILITADO and token is not None and hmac.compare_digest(token.encode(), TOKEN.encode())
+
+
+def atual() -> Perfil | None:
+    return _atual.get()
+
+
+def registrar_thread():
+    perfil = _atual.get()
+    if perfil is not None:
+        perfil.registrar_thread()
+
+
+def _token_do_request(scope) -> tuple[str | None, bytes]:
+    """Token do header ou da query; devolve também a query sem o parâmetro."""
+    for nome, valor in scope["headers"]:
+        if nome == HEADER.encode():
+            return valor.decode("latin-1"), scope["query_string"]
+    if f"{PARAMETRO}=".encode() not in scope["query_string"]:
+        return None, scope["query_string"]
+    pares = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    token = next((v for k, v in pares if k == PARAMETRO), None)
+    return token, urlencode([(k, v) for k, v in pares if k != PARAMETRO]).encode()
+
+
+class PerfilMiddleware:
+    """Middleware ASGI: perfila só o request que trouxer o token."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token, query = _token_do_request(scope)
+        if not autorizado(token) or scope["path"].startswith(ROTA_DIAGNOSTICO):
+            return await self.app(scope, receive, send)
+
+        # o token não fica guardado no caminho do perfil
+        caminho = scope["path"] + (f"?{query.decode('latin-1')}" if query else "")
+        perfil = Perfil(scope["method"], caminho)
+        status = None
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                tempos = f"app;dur={perfil.decorrido_ms():.1f}, sql;dur={perfil.sql_ms():.1f}"
+                mensagem["headers"] = [
+                    *mensagem.get("headers", []),
+                    (b"x-perfil-id", perfil.id.encode()),
+                    (b"server-timing", tempos.encode()),
+                ]
+            await send(mensagem)
+
+        marca = _atual.set(perfil)
+        perfil.iniciar()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            await perfil.encerrar(status)
+            _atual.reset(marca)
+            guardados.guardar(perfil)
+
+
+def instrumentar(engine):
+    """Tempo de cada cursor.execute e registro da thread no checkout (Postgres)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        registrar_thread()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if _atual.get() is not None:
+            conn.info.setdefault("perfil_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        perfil = _atual.get()
+        inicios = conn.info.get("perfil_t0")
+        if perfil is not None and inicios:
+            perfil.registrar_cursor(statement, (time.perf_counter() - inicios.pop()) * 1000, cursor.rowcount)
@@ -0,0 +1,145 @@
+"""
+Subida da API (lifespan do FastAPI): o primeiro request depois de o host
+acordar a instância não paga engine, TLS com o Postgres e planos frios.
+
+Fases, em ordem:
+1. engine: cria o engine (db.obter_engine). No DuckDB é aqui que os Parquet
+   vão para a memória;
+2. aquecer_pool: abre API_AQUECER_CONEXOES conexões do pool ao mesmo tempo
+   (conexão + TLS + autenticação) e as devolve ao pool; só Postgres;
+3. primar (em segundo plano, API_PRIMAR=1): roda consultas.CONSULTAS_QUENTES
+   em cada conexão aquecida — deixa os PREPARE feitos (DB_PREPARED_STATEMENTS)
+   e as tabelas de resumo no cache do banco. Não segura a subida: o servidor
+   já aceita requests enquanto isso roda.
+
+Falha de rede no aquecimento/primar não derruba a API (o pool reconecta
+sozinho com pool_pre_ping); fica registrada nas fases. Erro de configuração
+do engine (ex.: sem POSTGRES_PASSWORD) continua derrubando a subida.
+
+Tempos em GET /api/diagnostico/subida (com o token de API_PERFIL_TOKEN) e no
+log do processo.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from . import consultas, db
+
+# 3 = as consultas simultâneas do /api/dashboard
+AQUECER_CONEXOES = int(os.getenv("API_AQUECER_CONEXOES", "3"))
+PRIMAR = os.getenv("API_PRIMAR", "1") == "1"
+
+
+class _Subida:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fases: dict[str, dict] = {}
+        self.conexoes_aquecidas = 0
+
+    def registrar(self, fase: str, inicio: float, **extra):
+        ms = round((time.perf_counter() - inicio) * 1000, 1)
+        with self._lock:
+            self.fases[fase] = {"ms": ms, **extra}
+        detalhes = "".join(f" {k}={v}" for k, v in extra.items())
+        print(f"[subida] {fase}: {ms} ms{detalhes}", flush=True)
+
+    def como_dict(self) -> dict:
+        with self._lock:
+            return {
+                "motor": consultas.MOTOR,
+                "conexoes_aquecidas": self.conexoes_aquecidas,
+                "primar": PRIMAR,
+                "fases": dict(self.fases),
+            }
+
+
+subida = _Subida()
+
+
+def _falhou(fase: str, inicio: float, e: Exception, **extra):
+    # a mensagem (que no psycopg2 traz host/porta do banco) só vai para o log;
+    # nas fases fica só a classe da exceção
+    texto = str(e).strip()
+    print(f"[subida] {fase}: {type(e).__name__}: {texto.splitlines()[0] if texto else ''}", flush=True)
+    subida.registrar(fase, inicio, erro=type(e).__name__, **extra)
+
+
+def _quantas_conexoes(engine) -> int:
+    # além do pool_size, a conexão extra (overflow) é fechada ao voltar
+    tamanho = engine.pool.size() if hasattr(engine.pool, "size") else AQUECER_CONEXOES
+    return max(0, min(AQUECER_CONEXOES, tamanho))
+
+
+def _segurando_conexoes(n: int, fn=None):
+    """Pega n conexões ao mesmo tempo (são conexões distintas do pool) e roda fn em cada uma."""
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix="subida") as ex:
+        abrindo = [ex.submit(db.conectar) for _ in range(n)]
+        conexoes = [f.result() for f in abrindo if f.exception() is None]
+        try:
+            erros = [f.exception() for f in abrindo if f.exception() is not None]
+            if erros:
+                raise erros[0]
+            if fn is not None:
+                for f in [ex.submit(fn, conn) for conn in conexoes]:
+                    f.result()
+        finally:
+            for conn in conexoes:
+                conn.close()
+
+
+def aquecer_pool() -> int:
+    inicio = time.perf_counter()
+    engine = db.obter_engine()
+    if not hasattr(engine, "pool"):
+        subida.registrar("aquecer_pool", inicio, conexoes=0, motivo=f"sem pool ({consultas.MOTOR})")
+        return 0
+
+    n = _quantas_conexoes(engine)
+    if n:
+        try:
+            _segurando_conexoes(n)
+        except Exception as e:
+            _falhou("aquecer_pool", inicio, e, conexoes=0)
+            return 0
+    subida.conexoes_aquecidas = n
+    subida.registrar("aquecer_pool", inicio, conexoes=n)
+    return n
+
+
+def _rodar_quentes(conn):
+    for nome, sql, params in consultas.CONSULTAS_QUENTES:
+        consultas.executar(conn, nome, sql, params).mappings().all()
+
+
+def primar():
+    inicio = time.perf_counter()
+    # sem pool (DuckDB) uma passada basta: o que esquenta é o próprio banco
+    n = max(1, subida.conexoes_aquecidas)
+    try:
+        _segurando_conexoes(n, _rodar_quentes)
+    except Exception as e:
+        _falhou("primar", inicio, e, conexoes=n)
+        return
+    subida.registrar("primar", inicio, conexoes=n, consultas=len(consultas.CONSULTAS_QUENTES))
+
+
+def iniciar():
+    inicio = time.perf_counter()
+    db.obter_engine()
+    subida.registrar("engine", inicio, motor=consultas.MOTOR)
+    aquecer_pool()
+    if PRIMAR:
+        threading.Thread(target=primar, name="primar", daemon=True).start()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    inicio = time.perf_counter()
+    await asyncio.to_thread(iniciar)
+    subida.registrar("total", inicio)
+    yield
+    db.fechar()
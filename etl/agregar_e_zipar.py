@@ -1,13 +1,121 @@
 #agregar_e_zipar.py
 
-import zipfile
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+from instrumentacao import execucao, medir, span
+from normalizacao import aplicar_por_valor_unico
+from schema import escrever_csv, ler_csv
+
 IN_PATH = Path("data/output/consolidado_despesas_validado_enriquecido.csv")  # precisa ter UF
 OUT_CSV = Path("data/output/despesas_agregadas.csv")
 OUT_ZIP = Path("data/output/Teste_LucasAssuncaoBraga.zip")
 
+# Leitura em lotes: a memória depende do nº de grupos (RazaoSocial, UF),
+# não do nº de linhas do CSV.
+LINHAS_POR_LOTE = 250_000
+CHAVES = ["RazaoSocial", "UF"]
+REQUIRED = {"RazaoSocial", "UF", "Trimestre", "Ano", "ValorDespesas"}
+
+
+def _chave(v) -> str:
+    return "" if pd.isna(v) else str(v).strip()
+
+@medir()
+def estatisticas_lote(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estatísticas mescláveis de um lote, por (RazaoSocial, UF):
+    n_linhas, n_validos, soma, media e m2 (soma dos quadrados dos desvios).
+    """
+    # Normalização mínima (uma vez por valor distinto: as chaves chegam como category)
+    for col in CHAVES:
+        df[col] = aplicar_por_valor_unico(df[col], _chave)
+
+    # Já vem float64 do schema; vazios são NaN e não contam no mean/std [web:515]
+    valor = pd.to_numeric(df["ValorDespesas"], errors="coerce")
+
+    g = valor.groupby([df["RazaoSocial"], df["UF"]], sort=False)
+    n_validos = g.count()
+    out = pd.DataFrame(
+        {
+            "n_linhas": g.size(),
+            "n_validos": n_validos,
+            "soma": g.sum(),
+            "media": g.mean().fillna(0.0),
+            "m2": (g.var(ddof=0) * n_validos).fillna(0.0),
+        }
+    )
+    out.index.names = CHAVES
+    return out
+
+
+@medir()
+def combinar(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Junta dois conjuntos de estatísticas (fórmula de Chan/Welford em paralelo)."""
+    idx = a.index.union(b.index)
+    a = a.reindex(idx, fill_value=0)
+    b = b.reindex(idx, fill_value=0)
+
+    na = a["n_validos"].to_numpy(dtype="float64")
+    nb = b["n_validos"].to_numpy(dtype="float64")
+    n = na + nb
+    delta = b["media"].to_numpy() - a["media"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(n > 0, a["media"].to_numpy() + delta * nb / n, 0.0)
+        m2 = np.where(n > 0, a["m2"].to_numpy() + b["m2"].to_numpy() + delta**2 * na * nb / n, 0.0)
+
+    return pd.DataFrame(
+        {
+            "n_linhas": a["n_linhas"] + b["n_linhas"],
+            "n_validos": a["n_validos"] + b["n_validos"],
+            "soma": a["soma"] + b["soma"],
+            "media": media,
+            "m2": m2,
+        },
+        index=idx,
+    )
+
+
+@medir()
+def agregar_em_lotes(path: Path, linhas_por_lote: int = LINHAS_POR_LOTE) -> pd.DataFrame:
+    """
+    Uma passada pelo CSV, lote a lote. Saída igual ao groupby(...).agg(sum, mean,
+    std, size, count) feito com o arquivo inteiro em memória.
+    """
+    acumulado = None
+    lotes = ler_csv(path, "validado", usecols=CHAVES + ["ValorDespesas"], chunksize=linhas_por_lote)
+    lotes = iter(lotes)
+    while True:
+        with span("ler_lote") as sp:
+            lote = next(lotes, None)
+            sp.linhas = 0 if lote is None else len(lote)
+        if lote is None:
+            break
+        parcial = estatisticas_lote(lote)
+        acumulado = parcial if acumulado is None else combinar(acumulado, parcial)
+
+    colunas = ["total_despesas", "media_trimestral", "desvio_padrao", "n_linhas", "n_validos"]
+    if acumulado is None:
+        return pd.DataFrame(columns=CHAVES + colunas)
+
+    # mesma ordem de grupos do groupby (chaves ordenadas)
+    acumulado = acumulado.sort_index()
+    n = acumulado["n_validos"]
+    agg = pd.DataFrame(
+        {
+            "total_despesas": acumulado["soma"],
+            # mean/std do pandas: NaN sem valores válidos; std (ddof=1) NaN com 1 valor
+            "media_trimestral": (acumulado["soma"] / n).where(n > 0),
+            "desvio_padrao": np.sqrt(acumulado["m2"] / (n - 1)).where(n > 1),
+            "n_linhas": acumulado["n_linhas"],
+            "n_validos": n,
+        },
+        index=acumulado.index,
+    )
+    return agg.reset_index()
+
+
 def main():
     if not IN_PATH.exists():
         raise FileNotFoundError(
@@ -15,32 +123,12 @@ def main():
             "Você precisa gerar o consolidado enriquecido COM UF (passo 2.2)."
         )
 
-    df = pd.read_csv(IN_PATH, encoding="utf-8-sig", dtype=str, encoding_errors="strict")
-
-    required = {"RazaoSocial", "UF", "Trimestre", "Ano", "ValorDespesas"}
-    if not required.issubset(df.columns):
-        raise ValueError(f"Faltam colunas {sorted(required)}. Achei: {list(df.columns)}")
-
-    # Normalização mínima
-    df["RazaoSocial"] = df["RazaoSocial"].fillna("").astype(str).str.strip()
-    df["UF"] = df["UF"].fillna("").astype(str).str.strip()
-    df["Trimestre"] = df["Trimestre"].fillna("").astype(str).str.strip()
-    df["Ano"] = df["Ano"].fillna("").astype(str).str.strip()
-
-    # Converte para número; valores inválidos viram NaN e não contam no mean/std [web:515]
-    df["ValorDespesas_num"] = pd.to_numeric(df["ValorDespesas"], errors="coerce")
+    colunas = ler_csv(IN_PATH, "validado", nrows=0).columns
+    if not REQUIRED.issubset(colunas):
+        raise ValueError(f"Faltam colunas {sorted(REQUIRED)}. Achei: {list(colunas)}")
 
     # Agregação por RazaoSocial e UF (exatamente como pedido) [web:510]
-    agg = (
-        df.groupby(["RazaoSocial", "UF"], as_index=False)
-          .agg(
-              total_despesas=("ValorDespesas_num", "sum"),
-              media_trimestral=("ValorDespesas_num", "mean"),
-              desvio_padrao=("ValorDespesas_num", "std"),
-              n_linhas=("ValorDespesas_num", "size"),
-              n_validos=("ValorDespesas_num", "count"),
-          )
-    )
+    agg = agregar_em_lotes(IN_PATH)
 
     # std pode ficar NaN quando há 1 valor válido; preenche 0 para facilitar leitura
     agg["desvio_padrao"] = agg["desvio_padrao"].fillna(0.0)
@@ -48,12 +136,10 @@ def main():
     # Ordena por total (maior -> menor)
     agg = agg.sort_values("total_despesas", ascending=False)
 
-    OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    agg.to_csv(OUT_CSV, index=False, encoding="utf-8-sig")
-
-    # Compacta exatamente com o nome pedido
-    with zipfile.ZipFile(OUT_ZIP, "w", zipfile.ZIP_DEFLATED) as zf:
-        zf.write(OUT_CSV, arcname=OUT_CSV.name)
+    # CSV + ZIP (exatamente com o nome pedido) numa passada só
+    with span("escrever_csv_zip", arquivo=OUT_CSV) as sp:
+        escrever_csv(agg, OUT_CSV, "agregado", zip_path=OUT_ZIP)
+        sp.linhas = len(agg)
 
     print("OK CSV:", OUT_CSV)
     print("OK ZIP:", OUT_ZIP)
@@ -61,4 +147,5 @@ def main():
     print(agg.head(10).to_string(index=False))
 
 if __name__ == "__main__":
-    main()
+    with execucao("agregar_e_zipar"):
+        main()
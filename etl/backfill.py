@@ -0,0 +1,135 @@
+#backfill.py
+
+"""
+Backfill de um intervalo qualquer de trimestres das demonstrações contábeis.
+
+Download e processamento rodam em paralelo, ligados por filas limitadas:
+
+    [download] --fila(N)--> [processamento] --> consolidado_despesas.csv/.zip
+
+Enquanto o trimestre N é extraído/filtrado/agregado, o N+1 já está sendo
+baixado; com a fila cheia o download espera (não lota o disco com ZIPs que
+ainda não foram processados). O tempo total fica perto de
+max(download, processamento) em vez da soma dos dois.
+
+A saída é a mesma do process_files.py, então enriquecimento, agregação e
+import seguem iguais. ZIPs que já estão em data/raw não são baixados de novo.
+
+Uso:
+    python etl/backfill.py                          # histórico completo
+    python etl/backfill.py --de 2019T1 --ate 2025T2
+    python etl/pipeline.py --backfill 2019T1 2025T2 # idem, seguido do resto do ETL
+"""
+
+import argparse
+import queue
+import threading
+from pathlib import Path
+
+from download_ans import baixar_arquivo, destino_zip, obter_trimestres, parse_trimestre
+from instrumentacao import execucao, span
+from process_files import EXTRACTED_DIR, OUTPUT_DIR, RAW_DIR, processar_zip, salvar_consolidado
+
+TAMANHO_FILA = 2
+_FIM = object()
+
+
+class _Falha:
+    def __init__(self, erro: BaseException):
+        self.erro = erro
+
+
+def _colocar(fila: queue.Queue, item, parar: threading.Event) -> bool:
+    """put() que desiste se o consumidor já parou (evita travar a thread)."""
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def baixar_em_fila(trimestres, raw_dir: Path, fila: queue.Queue, parar: threading.Event):
+    """Produtor: baixa os ZIPs em ordem e entrega (ano, tri, caminho) na fila."""
+    try:
+        for ano, tri, url in trimestres:
+            if parar.is_set():
+                return
+            destino = destino_zip(raw_dir, ano, tri, url)
+            if destino.exists():
+                print(f"  (já baixado) {destino.name}")
+            else:
+                baixar_arquivo(url, destino)
+            with span("fila_cheia"):
+                if not _colocar(fila, (ano, tri, destino), parar):
+                    return
+        _colocar(fila, _FIM, parar)
+    except BaseException as e:
+        _colocar(fila, _Falha(e), parar)
+
+
+def backfill(
+    inicio: tuple[int, int] | None = None,
+    fim: tuple[int, int] | None = None,
+    raw_dir: Path = RAW_DIR,
+    extracted_dir: Path = EXTRACTED_DIR,
+    output_dir: Path = OUTPUT_DIR,
+    tamanho_fila: int = TAMANHO_FILA,
+) -> Path:
+    trimestres = obter_trimestres(inicio, fim)
+    if not trimestres:
+        raise RuntimeError("Nenhum trimestre publicado no intervalo pedido.")
+    raw_dir.mkdir(parents=True, exist_ok=True)
+
+    print("\n" + "=" * 50)
+    print(f"BACKFILL: {len(trimestres)} trimestres ({trimestres[0][0]}T{trimestres[0][1]} a {trimestres[-1][0]}T{trimestres[-1][1]})")
+    print("=" * 50)
+
+    fila: queue.Queue = queue.Queue(maxsize=max(1, tamanho_fila))
+    parar = threading.Event()
+    produtor = threading.Thread(
+        target=baixar_em_fila, args=(trimestres, raw_dir, fila, parar), name="download", daemon=True
+    )
+    produtor.start()
+
+    todos = []
+    try:
+        while True:
+            with span("aguardando_download"):
+                item = fila.get()
+            if item is _FIM:
+                break
+            if isinstance(item, _Falha):
+                raise item.erro
+            ano, tri, zip_path = item
+            with span("processar_trimestre", arquivo=zip_path) as sp:
+                regs = processar_zip(zip_path, extracted_dir)
+                sp.linhas = len(regs)
+            print(f"OK {ano}T{tri}: {len(regs)} registros")
+            todos.extend(regs)
+    finally:
+        parar.set()
+        produtor.join()
+
+    csv_path = salvar_consolidado(todos, output_dir)
+    zip_path = csv_path.with_suffix(".zip")
+    print("Pronto:", zip_path)
+    return zip_path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Baixa e processa um intervalo de trimestres com download e processamento em paralelo.")
+    ap.add_argument("--de", type=parse_trimestre, metavar="AAAATn", help="primeiro trimestre (padrão: o mais antigo publicado)")
+    ap.add_argument("--ate", type=parse_trimestre, metavar="AAAATn", help="último trimestre (padrão: o mais recente)")
+    ap.add_argument("--fila", type=int, default=TAMANHO_FILA, help=f"ZIPs baixados aguardando processamento (padrão: {TAMANHO_FILA})")
+    args = ap.parse_args(argv)
+
+    if args.de and args.ate and args.de > args.ate:
+        ap.error("--de depois de --ate")
+    backfill(args.de, args.ate, tamanho_fila=args.fila)
+
+
+if __name__ == "__main__":
+    with execucao("backfill"):
+        main()
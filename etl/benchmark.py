@@ -0,0 +1,184 @@
+#benchmark.py
+
+"""
+Benchmark do ETL com dados sintéticos (gerar_dados_sinteticos.py).
+
+Para cada escala cria uma pasta de trabalho temporária, gera os ZIPs e o
+CADOP e roda, em ordem, process_files -> enrich_cadop -> enrich_uf_modalidade
+-> agregar_e_zipar -> import_postgres, cada um como subprocesso (igual ao
+pipeline.py). Mede tempo, linhas, linhas/s e pico de RSS de cada etapa e
+junta os spans mais caros dos relatórios de instrumentacao.py.
+
+O import_postgres só roda com POSTGRES_PASSWORD definido e SUBSTITUI as
+tabelas do banco apontado por POSTGRES_* (use um banco de teste).
+
+Uso:
+    python etl/benchmark.py                      # escalas 1, 10 e 100
+    python etl/benchmark.py --escala 1 --escala 10 --repeticoes 3
+    python etl/benchmark.py --escala 1 --sem-import --manter
+
+Resultado em data/output/benchmark/benchmark_<data>.json.
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from gerar_dados_sinteticos import CONTAS_POR_OPERADORA, gerar
+from pipeline import ETAPAS, executar_etapa
+
+ESCALAS_PADRAO = [1, 10, 100]
+ETAPAS_BENCHMARK = ["process_files", "enrich_cadop", "enrich_uf_modalidade", "agregar_e_zipar", "import_postgres"]
+# argumentos extras por etapa (carga completa, para medir sempre o mesmo trabalho)
+ARGS_BENCHMARK = {"import_postgres": ["--completo"]}
+OUT_DIR = Path("data/output/benchmark")
+TOP_SPANS = 5
+
+
+def etapas_benchmark(com_import: bool):
+    por_nome = {e.nome: e for e in ETAPAS}
+    etapas = []
+    for nome in ETAPAS_BENCHMARK:
+        if nome == "import_postgres" and not com_import:
+            continue
+        etapa = por_nome[nome]
+        if nome in ARGS_BENCHMARK:
+            etapa = dataclasses.replace(etapa, args=[*etapa.args, *ARGS_BENCHMARK[nome]])
+        etapas.append(etapa)
+    return etapas
+
+
+def spans_do_relatorio(perf_dir: Path, script: str, execucao: str) -> list[dict]:
+    """Spans mais caros do relatório que o script gravou nesta execução."""
+    relatorios = sorted(perf_dir.glob(f"{script}_*_{execucao}.json"))
+    if not relatorios:
+        return []
+    dados = json.loads(relatorios[-1].read_text(encoding="utf-8"))
+    spans = sorted(dados.get("spans", {}).items(), key=lambda kv: -kv[1]["segundos"])
+    return [
+        {"span": nome, "segundos": s["segundos"], "chamadas": s["chamadas"], "linhas_por_seg": s.get("linhas_por_seg")}
+        for nome, s in spans[:TOP_SPANS]
+    ]
+
+
+def rodar_escala(escala: int, etapas, repeticoes: int, contas: int, base_dir: Path | None, manter: bool) -> dict:
+    workspace = Path(tempfile.mkdtemp(prefix=f"ans_benchmark_{escala}x_", dir=base_dir)).resolve()
+    print(f"\n=== Escala {escala}x em {workspace} ===")
+
+    inicio = time.perf_counter()
+    geracao = gerar(workspace, escala, contas_por_operadora=contas)
+    geracao["segundos"] = round(time.perf_counter() - inicio, 3)
+
+    resultado = {"escala": escala, "workspace": str(workspace), "geracao": geracao, "etapas": []}
+    cwd = Path.cwd()
+    os.chdir(workspace)  # os scripts usam caminhos relativos (data/raw, data/output)
+    try:
+        for etapa in etapas:
+            execucoes = []
+            for _ in range(repeticoes):
+                os.environ["ETL_EXECUCAO_ID"] = uuid.uuid4().hex[:12]
+                m = executar_etapa(etapa)
+                m["spans"] = spans_do_relatorio(
+                    Path("data/output/perf"), Path(etapa.script).stem, os.environ["ETL_EXECUCAO_ID"]
+                )
+                execucoes.append(m)
+                if m["status"] != "ok":
+                    break
+
+            tempos = [m["segundos"] for m in execucoes if m["status"] == "ok"]
+            resumo = {
+                "etapa": etapa.nome,
+                "status": execucoes[-1]["status"],
+                "segundos": round(statistics.median(tempos), 3) if tempos else None,
+                "linhas_entrada": execucoes[-1]["linhas_entrada"],
+                "linhas_saida": execucoes[-1]["linhas_saida"],
+                "pico_rss_mb": max((m["pico_rss_mb"] or 0) for m in execucoes) or None,
+                "execucoes": execucoes,
+            }
+            if etapa.nome == "process_files":
+                # a entrada são ZIPs; conta as linhas geradas
+                resumo["linhas_entrada"] = geracao["linhas_demonstracoes"]
+            linhas = resumo["linhas_entrada"]
+            resumo["linhas_por_seg"] = round(linhas / resumo["segundos"], 1) if linhas and resumo["segundos"] else None
+            resultado["etapas"].append(resumo)
+            if resumo["status"] != "ok":
+                print(f"[{etapa.nome}] falhou; interrompendo a escala {escala}x")
+                break
+    finally:
+        os.chdir(cwd)
+        os.environ.pop("ETL_EXECUCAO_ID", None)
+        if not manter:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    return resultado
+
+
+def imprimir_resumo(resultados: list[dict]):
+    print("\n" + "=" * 84)
+    print(f"{'escala':<8}{'etapa':<22}{'status':<8}{'tempo(s)':>10}{'linhas in':>12}{'linhas/s':>12}{'RSS(MB)':>10}")
+    print("-" * 84)
+    for r in resultados:
+        print(f"{str(r['escala']) + 'x':<8}{'(geração)':<22}{'ok':<8}{r['geracao']['segundos']:>10}"
+              f"{r['geracao']['linhas_demonstracoes']:>12}{'-':>12}{'-':>10}")
+        for e in r["etapas"]:
+            def fmt(chave):
+                v = e.get(chave)
+                return "-" if v is None else str(v)
+            print(
+                f"{'':<8}{e['etapa']:<22}{e['status']:<8}{fmt('segundos'):>10}"
+                f"{fmt('linhas_entrada'):>12}{fmt('linhas_por_seg'):>12}{fmt('pico_rss_mb'):>10}"
+            )
+    print("=" * 84)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mede o ETL de ponta a ponta com dados sintéticos.")
+    ap.add_argument("--escala", type=int, action="append", help="multiplicador do volume atual (repetível; padrão: 1 10 100)")
+    ap.add_argument("--repeticoes", type=int, default=1, help="execuções por etapa; reporta a mediana")
+    ap.add_argument("--contas", type=int, default=CONTAS_POR_OPERADORA, help="linhas por operadora/trimestre")
+    ap.add_argument("--sem-import", action="store_true", help="não roda o import_postgres")
+    ap.add_argument("--workspace", type=Path, help="onde criar as pastas temporárias (padrão: tmp do sistema)")
+    ap.add_argument("--manter", action="store_true", help="não apaga as pastas de trabalho")
+    args = ap.parse_args(argv)
+
+    com_import = not args.sem_import and bool(os.getenv("POSTGRES_PASSWORD"))
+    if not args.sem_import and not com_import:
+        print("POSTGRES_PASSWORD não definido: import_postgres fica fora do benchmark.")
+    if com_import:
+        print(f"ATENÇÃO: import_postgres vai substituir as tabelas de {os.getenv('POSTGRES_DB', 'ans_db')}.")
+
+    etapas = etapas_benchmark(com_import)
+    if args.workspace:
+        args.workspace.mkdir(parents=True, exist_ok=True)
+
+    iniciado_em = time.strftime("%Y-%m-%dT%H:%M:%S")
+    resultados = []
+    for escala in args.escala or ESCALAS_PADRAO:
+        resultados.append(
+            rodar_escala(escala, etapas, max(1, args.repeticoes), args.contas, args.workspace, args.manter)
+        )
+
+    imprimir_resumo(resultados)
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    destino = OUT_DIR / f"benchmark_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    destino.write_text(
+        json.dumps({"inicio": iniciado_em, "python": sys.version.split()[0], "resultados": resultados}, indent=2, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    print("Resultado:", destino)
+
+    falhou = any(e["status"] != "ok" for r in resultados for e in r["etapas"])
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
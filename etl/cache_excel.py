@@ -0,0 +1,120 @@
+#cache_excel.py
+
+"""
+Cache de conversão das planilhas (.xlsx/.xls) lidas pelo process_files.
+
+pd.read_excel é de longe o parser mais lento do caminho e as planilhas da
+ANS não mudam depois de publicadas. Na primeira leitura a planilha vira um
+Parquet em data/cache/excel/, com nome pelo SHA-256 do conteúdo (+ motor de
+leitura); nas execuções seguintes (pipeline, backfill, reprocessamentos)
+lê-se o Parquet. Planilha alterada = hash novo = nova conversão.
+
+O conteúdo é o mesmo do read_excel(dtype=str): todas as colunas texto,
+vazios como NaN.
+
+Variáveis de ambiente:
+    ETL_EXCEL_CACHE=0        desliga o cache (lê a planilha sempre)
+    ETL_EXCEL_CACHE_DIR      pasta do cache (padrão: data/cache/excel)
+    ETL_EXCEL_ENGINE         motor do read_excel; "calamine" (pacote
+                             python-calamine) é bem mais rápido. Sem o pacote,
+                             volta para o motor padrão do pandas.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from instrumentacao import contar
+
+CACHE_DIR = Path(os.getenv("ETL_EXCEL_CACHE_DIR", "data/cache/excel"))
+HABILITADO = os.getenv("ETL_EXCEL_CACHE", "1") == "1"
+MOTOR = os.getenv("ETL_EXCEL_ENGINE") or None
+# muda quando o formato do cache muda (invalida o que já foi convertido)
+VERSAO = 1
+
+
+def hash_arquivo(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def motor_excel() -> str | None:
+    if MOTOR == "calamine":
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            print("AVISO: ETL_EXCEL_ENGINE=calamine sem o pacote python-calamine; usando o motor padrão do pandas.")
+            return None
+    return MOTOR
+
+
+def caminho_cache(path: Path, motor: str | None, cache_dir: Path = CACHE_DIR) -> Path:
+    return cache_dir / f"{hash_arquivo(path)[:32]}_{motor or 'padrao'}_v{VERSAO}.parquet"
+
+
+def _gravar(df: pd.DataFrame, destino: Path):
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    # .tmp por processo: backfill e pipeline podem converter a mesma planilha juntos
+    tmp = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    # Parquet só aceita nome de coluna texto (o process_files já faz str(c) no cabeçalho)
+    df = df.set_axis([str(c) for c in df.columns], axis=1)
+    # VARCHAR explícito: coluna toda vazia (só NaN) não pode virar número no Parquet
+    colunas = ", ".join('CAST("{0}" AS VARCHAR) AS "{0}"'.format(c.replace('"', '""')) for c in df.columns)
+    try:
+        with duckdb.connect() as con:
+            con.register("planilha", df)
+            con.execute(f"COPY (SELECT {colunas} FROM planilha) TO '{tmp.as_posix()}' (FORMAT parquet)")
+        os.replace(tmp, destino)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _ler(origem: Path) -> pd.DataFrame:
+    with duckdb.connect() as con:
+        df = con.execute(f"SELECT * FROM read_parquet('{origem.as_posix()}')").df()
+    # NULL volta como None; o read_excel(dtype=str) devolve NaN
+    return df.astype(object).where(df.notna(), np.nan)
+
+
+def ler_excel(path: Path, info: dict | None = None) -> pd.DataFrame:
+    """read_excel(dtype=str) com cache. `info` recebe motor e hit/miss (para o span)."""
+    info = {} if info is None else info
+    motor = motor_excel()
+    info["motor"] = motor or "padrao"
+
+    if not HABILITADO:
+        info["cache"] = "desligado"
+        return pd.read_excel(path, dtype=str, engine=motor)
+
+    cache = caminho_cache(path, motor)
+    if cache.exists():
+        try:
+            df = _ler(cache)
+            contar("excel_cache.hit")
+            info["cache"] = "hit"
+            return df
+        except Exception as e:
+            # cache corrompido não pode custar a planilha: relê o original
+            print(f"AVISO: cache {cache} ilegível ({type(e).__name__}: {e}); lendo a planilha de novo")
+            contar("excel_cache.falha_ler")
+
+    contar("excel_cache.miss")
+    info["cache"] = "miss"
+    df = pd.read_excel(path, dtype=str, engine=motor)
+    try:
+        _gravar(df, cache)
+    except Exception as e:
+        # disco cheio, pasta só leitura, erro do DuckDB: a leitura já deu certo
+        print(f"AVISO: não deu para gravar o cache {cache} ({type(e).__name__}: {e}); seguindo sem cache")
+        contar("excel_cache.falha_gravar")
+        info["cache"] = "falha_gravar"
+    return df
@@ -0,0 +1,77 @@
+#cadop.py
+
+import os
+import time
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+from instrumentacao import execucao, medir
+from schema import ler_csv
+
+CADOP_ATIVAS_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
+CADOP_CANCELADAS_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_canceladas/Relatorio_cadop_canceladas.csv"
+
+# Cópia local dos relatórios (preenchida rodando este script / etapa do pipeline).
+# Se existir, os enriquecimentos leem daqui em vez de baixar de novo.
+CADOP_DIR = Path("data/raw/cadop")
+# cópia local mais velha que isso é baixada de novo (o CADOP muda toda semana)
+CADOP_VALIDADE_DIAS = float(os.getenv("CADOP_VALIDADE_DIAS", "7"))
+
+
+def caminho_local(url: str, cadop_dir: Path = CADOP_DIR) -> Path:
+    return cadop_dir / url.rsplit("/", 1)[-1]
+
+
+def ler_cadop_bytes(conteudo: bytes) -> pd.DataFrame:
+    # latin1 nunca quebra e preserva byte-a-byte; depois limpamos/normalizamos.
+    df = ler_csv(BytesIO(conteudo), "cadop", sep=";", encoding="latin1")
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def baixar_bytes(url: str) -> bytes:
+    r = requests.get(url, timeout=120)
+    r.raise_for_status()
+    return r.content
+
+
+@medir()
+def baixar_cadop(url: str) -> pd.DataFrame:
+    local = caminho_local(url)
+    if not local.exists():
+        return ler_cadop_bytes(baixar_bytes(url))
+
+    data = time.strftime("%Y-%m-%d", time.localtime(local.stat().st_mtime))
+    idade_dias = (time.time() - local.stat().st_mtime) / 86400
+    if idade_dias <= CADOP_VALIDADE_DIAS:
+        print(f"  (usando cópia local de {data})", local)
+        return ler_cadop_bytes(local.read_bytes())
+
+    print(f"  AVISO: cópia local de {data} tem mais de {CADOP_VALIDADE_DIAS:g} dias; baixando de novo", local)
+    try:
+        conteudo = baixar_bytes(url)
+    except requests.RequestException as e:
+        print(f"  AVISO: download falhou ({e}); usando a cópia local desatualizada de {data}")
+        return ler_cadop_bytes(local.read_bytes())
+    local.write_bytes(conteudo)
+    return ler_cadop_bytes(conteudo)
+
+
+def salvar_cadop(cadop_dir: Path = CADOP_DIR):
+    cadop_dir.mkdir(parents=True, exist_ok=True)
+    salvos = []
+    for url in (CADOP_ATIVAS_URL, CADOP_CANCELADAS_URL):
+        destino = caminho_local(url, cadop_dir)
+        print(f"  -> {url.split('/')[-1]}")
+        destino.write_bytes(baixar_bytes(url))
+        salvos.append(destino)
+    print("OK CADOP salvo em:", cadop_dir)
+    return salvos
+
+
+if __name__ == "__main__":
+    with execucao("cadop"):
+        salvar_cadop()
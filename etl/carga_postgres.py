@@ -0,0 +1,218 @@
+#carga_postgres.py
+
+import io
+import json
+import os
+import struct
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+import pandas as pd
+
+LINHAS_POR_LOTE = 100_000
+
+# Cabeçalho/rodapé do formato binário do COPY (assinatura + flags + extensão)
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+
+NULL_CSV = "\\N"
+
+
+def _bin_texto(v) -> bytes:
+    return str(v).encode("utf-8")
+
+
+def _bin_int2(v) -> bytes:
+    return struct.pack("!h", int(v))
+
+
+def _bin_int4(v) -> bytes:
+    return struct.pack("!i", int(v))
+
+
+def _bin_int8(v) -> bytes:
+    return struct.pack("!q", int(v))
+
+
+def _bin_numeric(v) -> bytes:
+    """
+    NUMERIC no formato binário do Postgres: dígitos em base 10000.
+    (ndigits, weight, sign, dscale, digits...)
+    """
+    d = Decimal(repr(float(v))) if isinstance(v, float) else Decimal(str(v))
+    if d.is_nan():
+        return struct.pack("!hhHh", 0, 0, 0xC000, 0)
+    s = format(abs(d), "f")
+    parte_int, _, parte_frac = s.partition(".")
+    dscale = len(parte_frac)
+
+    parte_int = parte_int.lstrip("0")
+    parte_int = "0" * (-len(parte_int) % 4) + parte_int
+    parte_frac = parte_frac + "0" * (-len(parte_frac) % 4)
+
+    grupos = [int(parte_int[i:i + 4]) for i in range(0, len(parte_int), 4)]
+    weight = len(grupos) - 1
+    grupos += [int(parte_frac[i:i + 4]) for i in range(0, len(parte_frac), 4)]
+
+    # zeros nas pontas não são armazenados
+    while grupos and grupos[0] == 0:
+        grupos.pop(0)
+        weight -= 1
+    while grupos and grupos[-1] == 0:
+        grupos.pop()
+    if not grupos:
+        weight = 0
+
+    sign = 0x4000 if d.is_signed() and grupos else 0x0000
+    return struct.pack(f"!hhhh{len(grupos)}H", len(grupos), weight, sign, dscale, *grupos)
+
+
+ENCODERS_BINARIOS = {
+    "text": _bin_texto,
+    "int2": _bin_int2,
+    "int4": _bin_int4,
+    "int8": _bin_int8,
+    "numeric": _bin_numeric,
+}
+
+
+def _lote_csv(df: pd.DataFrame) -> io.StringIO:
+    buf = io.StringIO()
+    df.to_csv(buf, header=False, index=False, na_rep=NULL_CSV)
+    buf.seek(0)
+    return buf
+
+
+def _lote_binario(df: pd.DataFrame, tipos: dict) -> io.BytesIO:
+    encoders = [ENCODERS_BINARIOS[tipos.get(c, "text")] for c in df.columns]
+    n_cols = struct.pack("!h", len(encoders))
+    nulo = struct.pack("!i", -1)
+
+    buf = io.BytesIO()
+    buf.write(PGCOPY_HEADER)
+    for linha in df.itertuples(index=False, name=None):
+        buf.write(n_cols)
+        for enc, v in zip(encoders, linha):
+            if v is None or v is pd.NA or (isinstance(v, float) and v != v):
+                buf.write(nulo)
+                continue
+            dado = enc(v)
+            buf.write(struct.pack("!i", len(dado)))
+            buf.write(dado)
+    buf.write(PGCOPY_TRAILER)
+    buf.seek(0)
+    return buf
+
+
+def copiar_dataframe(
+    engine,
+    tabela: str,
+    df: pd.DataFrame,
+    formato: str = "csv",
+    tipos: dict | None = None,
+    linhas_por_lote: int = LINHAS_POR_LOTE,
+) -> dict:
+    """
+    Carrega o DataFrame via COPY FROM STDIN, em lotes montados em memória.
+    - formato="csv": usa o writer C do pandas (padrão, mais rápido)
+    - formato="binary": precisa de `tipos` (coluna -> text/int2/int4/int8/numeric)
+    Retorna {"tabela", "linhas", "segundos", "linhas_por_seg"}.
+    """
+    if formato not in ("csv", "binary"):
+        raise ValueError(f"Formato de COPY inválido: {formato}")
+
+    colunas = ", ".join(df.columns)
+    if formato == "csv":
+        sql = f"COPY {tabela} ({colunas}) FROM STDIN WITH (FORMAT csv, NULL '{NULL_CSV}')"
+    else:
+        sql = f"COPY {tabela} ({colunas}) FROM STDIN WITH (FORMAT binary)"
+
+    inicio = time.perf_counter()
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        for i in range(0, len(df), linhas_por_lote):
+            lote = df.iloc[i:i + linhas_por_lote]
+            buf = _lote_csv(lote) if formato == "csv" else _lote_binario(lote, tipos or {})
+            cur.copy_expert(sql, buf)
+        cur.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "tabela": tabela,
+        "linhas": len(df),
+        "segundos": segundos,
+        "linhas_por_seg": len(df) / segundos if segundos > 0 else 0.0,
+    }
+
+
+# Marcador de carga concluída: uma linha em etl_carga no banco + o mesmo id em
+# data/output/import_postgres.json. O pipeline só considera o import em dia se
+# o id do arquivo estiver no banco (banco zerado ou outro banco = roda de novo).
+MARCADOR_TABELA = "etl_carga"
+MARCADOR_PATH = Path("data/output/import_postgres.json")
+
+
+def url_postgres() -> str | None:
+    """URL do banco a partir de POSTGRES_* (None sem POSTGRES_PASSWORD)."""
+    senha = os.getenv("POSTGRES_PASSWORD")
+    if not senha:
+        return None
+    return (
+        f"postgresql://{os.getenv('POSTGRES_USER', 'postgres')}:{senha}"
+        f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}"
+        f"/{os.getenv('POSTGRES_DB', 'ans_db')}"
+    )
+
+
+def registrar_carga(engine, marcador: Path = MARCADOR_PATH) -> str:
+    from sqlalchemy import text
+
+    carga_id = uuid.uuid4().hex
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {MARCADOR_TABELA} "
+                "(id TEXT PRIMARY KEY, concluida_em TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+        )
+        conn.execute(text(f"INSERT INTO {MARCADOR_TABELA} (id) VALUES (:id)"), {"id": carga_id})
+    marcador.parent.mkdir(parents=True, exist_ok=True)
+    marcador.write_text(
+        json.dumps({"carga_id": carga_id, "concluida_em": time.strftime("%Y-%m-%dT%H:%M:%S")}, indent=2),
+        encoding="utf-8",
+    )
+    return carga_id
+
+
+def carga_confere(marcador: Path = MARCADOR_PATH) -> bool:
+    """A carga registrada no arquivo marcador está no banco configurado?"""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import SQLAlchemyError
+
+    url = url_postgres()
+    if url is None or not marcador.exists():
+        return False
+    carga_id = json.loads(marcador.read_text(encoding="utf-8")).get("carga_id")
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT to_regclass(:t)"), {"t": MARCADOR_TABELA}).scalar() is None:
+                return False
+            achou = conn.execute(
+                text(f"SELECT 1 FROM {MARCADOR_TABELA} WHERE id = :id"), {"id": carga_id}
+            ).first()
+            return achou is not None
+    except SQLAlchemyError as e:
+        print(f"AVISO: não deu para conferir a carga no banco ({type(e).__name__}); o import roda de novo")
+        return False
+    finally:
+        engine.dispose()
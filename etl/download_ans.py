@@ -1,11 +1,14 @@
 #download_ans.py
 
+import argparse
 import re
 from pathlib import Path
 
 import requests
 from bs4 import BeautifulSoup
 
+from instrumentacao import execucao, span
+
 BASE_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
 
 
@@ -51,6 +54,35 @@ def extrair_ano_tri_do_zip(nome_zip: str):
     return ano, tri
 
 
+def parse_trimestre(valor: str) -> tuple[int, int]:
+    """
+    "2025T1" (ou "2025t1", "2025_T1") -> (2025, 1). Tipo de argumento do
+    argparse usado por backfill, import_postgres e gerar_dados_sinteticos.
+    """
+    m = re.fullmatch(r"(\d{4})_?T([1-4])", valor.strip(), re.IGNORECASE)
+    if not m:
+        raise argparse.ArgumentTypeError(f"Trimestre inválido: {valor} (use AAAATn, ex.: 2025T1)")
+    return int(m.group(1)), int(m.group(2))
+
+
+def listar_zips_do_ano(ano: int) -> dict:
+    """(ano, tri) -> url do ZIP, para os ZIPs publicados na pasta do ano."""
+    url_ano = f"{BASE_URL}{ano}/"
+    print(f"\nProcurando em {ano}/...")
+
+    hrefs = listar_links(url_ano)
+    zips_hrefs = [h for h in hrefs if h.lower().endswith(".zip")]
+    print(f"  Total ZIPs em {ano}: {len(zips_hrefs)}")
+
+    encontrados = {}
+    for zip_href in zips_hrefs:
+        ano_zip, tri_zip = extrair_ano_tri_do_zip(zip_href)
+        if ano_zip and tri_zip:
+            encontrados[(ano_zip, tri_zip)] = url_ano.rstrip("/") + "/" + zip_href
+            print(f"    OK {zip_href} -> {ano_zip} T{tri_zip}")
+    return encontrados
+
+
 def obter_ultimos_tres_trimestres():
     anos = listar_anos()
     print(f"Anos disponiveis: {anos[-5:]}")
@@ -59,20 +91,7 @@ def obter_ultimos_tres_trimestres():
 
     # vai do ano mais recente pro mais antigo até juntar >= 3 trimestres
     for ano in reversed(anos):
-        url_ano = f"{BASE_URL}{ano}/"
-        print(f"\nProcurando em {ano}/...")
-
-        hrefs = listar_links(url_ano)
-        zips_hrefs = [h for h in hrefs if h.lower().endswith(".zip")]
-        print(f"  Total ZIPs em {ano}: {len(zips_hrefs)}")
-
-        for zip_href in zips_hrefs:
-            ano_zip, tri_zip = extrair_ano_tri_do_zip(zip_href)
-            if ano_zip and tri_zip:
-                url_zip = url_ano.rstrip("/") + "/" + zip_href
-                encontrados[(ano_zip, tri_zip)] = url_zip
-                print(f"    OK {zip_href} -> {ano_zip} T{tri_zip}")
-
+        encontrados.update(listar_zips_do_ano(ano))
         if len(encontrados) >= 3:
             break
 
@@ -85,22 +104,68 @@ def obter_ultimos_tres_trimestres():
     return ultimos3
 
 
+def obter_trimestres(inicio: tuple[int, int] | None = None, fim: tuple[int, int] | None = None):
+    """
+    Todos os trimestres publicados entre `inicio` e `fim` (inclusive; None = sem
+    limite), do mais antigo para o mais recente: [(ano, tri, url_zip), ...].
+    """
+    anos = listar_anos()
+    anos = [a for a in anos if (not inicio or a >= inicio[0]) and (not fim or a <= fim[0])]
+    print(f"Anos no intervalo: {anos}")
+
+    encontrados = {}
+    for ano in anos:
+        encontrados.update(listar_zips_do_ano(ano))
+
+    todos = sorted(
+        (a, t, url)
+        for (a, t), url in encontrados.items()
+        if (not inicio or (a, t) >= inicio) and (not fim or (a, t) <= fim)
+    )
+    print(f"\nTotal trimestres no intervalo: {len(todos)}")
+    return todos
+
+
+def destino_zip(raw_path: Path, ano: int, tri: int, zip_url: str) -> Path:
+    return raw_path / f"{ano}_T{tri}_{Path(zip_url).name}"
+
+
 def baixar_arquivo(url: str, destino: Path):
     destino.parent.mkdir(parents=True, exist_ok=True)
     print(f"  -> {url.split('/')[-1]}  para  {destino.name}")
 
-    resp = requests.get(url, stream=True, timeout=120)
-    resp.raise_for_status()
-
-    with open(destino, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=1024 * 1024):
-            if chunk:
-                f.write(chunk)
+    with span("baixar_arquivo", arquivo=destino) as sp:
+        resp = requests.get(url, stream=True, timeout=120)
+        resp.raise_for_status()
+
+        # grava em .part e renomeia no fim: um download interrompido não vira ZIP "válido"
+        parcial = destino.with_name(destino.name + ".part")
+        baixados = 0
+        with open(parcial, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                if chunk:
+                    f.write(chunk)
+                    baixados += len(chunk)
+        parcial.replace(destino)
+        sp.extra["bytes"] = baixados
 
     print(f"  OK Baixado: {destino.name}")
     return destino
 
 
+def ja_baixado(url: str, destino: Path) -> bool:
+    """ZIP local com o mesmo tamanho que o servidor informa (HEAD): não baixa de novo."""
+    if not destino.exists():
+        return False
+    try:
+        resp = requests.head(url, timeout=30, allow_redirects=True)
+        resp.raise_for_status()
+    except requests.RequestException:
+        return False
+    tamanho = resp.headers.get("Content-Length")
+    return tamanho is not None and int(tamanho) == destino.stat().st_size
+
+
 def baixar_zips_ultimos_tres_trimestres(raw_dir="data/raw"):
     raw_path = Path(raw_dir)
     raw_path.mkdir(parents=True, exist_ok=True)
@@ -113,9 +178,11 @@ def baixar_zips_ultimos_tres_trimestres(raw_dir="data/raw"):
 
     arquivos_baixados = []
     for ano, tri, zip_url in trimestres:
-        nome = Path(zip_url).name
-        destino = raw_path / f"{ano}_T{tri}_{nome}"
-        baixar_arquivo(zip_url, destino)
+        destino = destino_zip(raw_path, ano, tri, zip_url)
+        if ja_baixado(zip_url, destino):
+            print(f"  (já baixado, mesmo tamanho) {destino.name}")
+        else:
+            baixar_arquivo(zip_url, destino)
         arquivos_baixados.append(destino)
 
     print("\nOK DOWNLOAD CONCLUIDO!")
@@ -123,4 +190,5 @@ def baixar_zips_ultimos_tres_trimestres(raw_dir="data/raw"):
 
 
 if __name__ == "__main__":
-    baixar_zips_ultimos_tres_trimestres()
+    with execucao("download_ans"):
+        baixar_zips_ultimos_tres_trimestres()
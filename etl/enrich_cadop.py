@@ -1,27 +1,25 @@
 #enlrich_cadop.py
 
 import re
-import zipfile
-from io import BytesIO
 from pathlib import Path
 
 import pandas as pd
-import requests
-import ftfy
 
-CADOP_ATIVAS_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
-CADOP_CANCELADAS_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_canceladas/Relatorio_cadop_canceladas.csv"
+from cadop import CADOP_ATIVAS_URL, CADOP_CANCELADAS_URL, baixar_cadop
+from instrumentacao import anotar, execucao, medir, span
+from normalizacao import (
+    aplicar_por_valor_unico,
+    assert_no_replacement_char,
+    info_cache_texto,
+    limpar_coluna,
+)
+from schema import escrever_csv, ler_csv, tipar
 
 CONSOLIDADO_IN = Path("data/output/consolidado_despesas.csv")
 CONSOLIDADO_OUT = Path("data/output/consolidado_despesas_enriquecido.csv")
 OUTPUT_ZIP = Path("data/output/consolidado_despesas_enriquecido.zip")
 SEM_MATCH_CSV = Path("data/output/registroans_sem_match.csv")
 
-# NÃO remover \x80-\x9f (C1). Removemos só C0 e DEL para não “comer” caracteres
-# quando o arquivo é lido como latin1. (Esse foi o bug principal.)
-CTRL = re.compile(r"[\x00-\x1f\x7f]")
-
-
 def only_digits(x) -> str:
     return re.sub(r"\D", "", "" if x is None else str(x))
 
@@ -36,53 +34,23 @@ def key_reg_ans(x) -> str:
     return s.lstrip("0")  # 000477 -> 477
 
 
-def limpar_texto(x) -> str:
-    s = "" if x is None else str(x)
-    s = s.replace('"', "").strip()
-    s = CTRL.sub("", s)
-    s = ftfy.fix_text(s)  # corrige mojibake/glitches quando há informação [page:1]
-    return s.strip()
-
-
-def assert_no_replacement_char(series: pd.Series, label: str):
-    s = series.fillna("").astype(str)
-    if s.str.contains("\uFFFD").any():  # "�"
-        ex = s[s.str.contains("\uFFFD")].head(10).tolist()
-        raise ValueError(f"{label} contém '�' (U+FFFD). Exemplos: " + " | ".join(ex))
-
-
+@medir()
 def ler_consolidado(path: Path) -> pd.DataFrame:
     if not path.exists():
         raise FileNotFoundError(f"Arquivo não encontrado: {path}")
-    return pd.read_csv(path, encoding="utf-8-sig", dtype=str, encoding_errors="strict")
-
-
-def baixar_cadop(url: str) -> pd.DataFrame:
-    r = requests.get(url, timeout=120)
-    r.raise_for_status()
-
-    # latin1 nunca quebra e preserva byte-a-byte; depois limpamos/normalizamos.
-    df = pd.read_csv(BytesIO(r.content), sep=";", encoding="latin1", dtype=str)
-    df.columns = [str(c).strip() for c in df.columns]
-    return df
-
-
-def compactar(csv_path: Path, zip_path: Path) -> Path:
-    zip_path.parent.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-        z.write(csv_path, arcname=csv_path.name)
-    return zip_path
+    return ler_csv(path, "consolidado")
 
 
+@medir()
 def preparar_cadop(df: pd.DataFrame) -> pd.DataFrame:
     required = {"REGISTRO_OPERADORA", "CNPJ", "Razao_Social"}
     if not required.issubset(set(df.columns)):
         raise ValueError(f"CADOP sem colunas esperadas. Achei: {list(df.columns)}")
 
     df = df.copy()
-    df["__REG_KEY__"] = df["REGISTRO_OPERADORA"].apply(key_reg_ans)
-    df["CNPJ"] = df["CNPJ"].apply(only_digits)
-    df["Razao_Social"] = df["Razao_Social"].apply(limpar_texto)
+    df["__REG_KEY__"] = aplicar_por_valor_unico(df["REGISTRO_OPERADORA"], key_reg_ans)
+    df["CNPJ"] = aplicar_por_valor_unico(df["CNPJ"], only_digits)
+    df["Razao_Social"] = limpar_coluna(df["Razao_Social"])
 
     # se aparecer '�' aqui, já houve perda antes (não deveria acontecer)
     assert_no_replacement_char(df["Razao_Social"], "CADOP.Razao_Social")
@@ -93,6 +61,7 @@ def preparar_cadop(df: pd.DataFrame) -> pd.DataFrame:
     return df[["__REG_KEY__", "CNPJ", "Razao_Social"]]
 
 
+@medir()
 def aplicar_lookup(df_base: pd.DataFrame, df_lookup: pd.DataFrame, tag: str) -> pd.DataFrame:
     df_lookup = df_lookup.rename(
         columns={"CNPJ": f"CNPJ_{tag}", "Razao_Social": f"Razao_Social_{tag}"}
@@ -116,9 +85,9 @@ def main():
     if "RazaoSocial" not in df_cons.columns:
         df_cons["RazaoSocial"] = ""
 
-    df_cons["__REG_KEY__"] = df_cons["RegistroANS"].apply(key_reg_ans)
-    df_cons["CNPJ"] = df_cons["CNPJ"].fillna("").apply(only_digits)
-    df_cons["RazaoSocial"] = df_cons["RazaoSocial"].fillna("").apply(limpar_texto)
+    df_cons["__REG_KEY__"] = aplicar_por_valor_unico(df_cons["RegistroANS"], key_reg_ans)
+    df_cons["CNPJ"] = aplicar_por_valor_unico(df_cons["CNPJ"].fillna(""), only_digits)
+    df_cons["RazaoSocial"] = limpar_coluna(df_cons["RazaoSocial"].fillna(""))
 
     assert_no_replacement_char(df_cons["RazaoSocial"], "Entrada.RazaoSocial")
 
@@ -143,16 +112,17 @@ def main():
     df_out["RazaoSocial"] = df_out["RazaoSocial"].mask(df_out["RazaoSocial"].eq(""), rz_ativas)
     df_out["RazaoSocial"] = df_out["RazaoSocial"].mask(df_out["RazaoSocial"].eq(""), rz_cancel)
 
-    df_out["RazaoSocial"] = df_out["RazaoSocial"].apply(limpar_texto)
-    df_out["CNPJ"] = df_out["CNPJ"].apply(only_digits)
+    df_out["RazaoSocial"] = limpar_coluna(df_out["RazaoSocial"])
+    df_out["CNPJ"] = aplicar_por_valor_unico(df_out["CNPJ"], only_digits)
 
-    colunas_final = ["CNPJ", "RazaoSocial", "RegistroANS", "Trimestre", "Ano", "ValorDespesas"]
-    df_out_final = df_out[colunas_final].copy()
+    assert_no_replacement_char(df_out["RazaoSocial"], "Saída.RazaoSocial")
 
-    assert_no_replacement_char(df_out_final["RazaoSocial"], "Saída.RazaoSocial")
+    # CNPJ/RazaoSocial/RegistroANS viram category (repetem a cada trimestre)
+    df_out_final = tipar(df_out, "enriquecido")
 
-    CONSOLIDADO_OUT.parent.mkdir(parents=True, exist_ok=True)
-    df_out_final.to_csv(CONSOLIDADO_OUT, index=False, encoding="utf-8-sig")
+    with span("escrever_csv_zip", arquivo=CONSOLIDADO_OUT) as sp:
+        escrever_csv(df_out_final, CONSOLIDADO_OUT, "enriquecido", zip_path=OUTPUT_ZIP)
+        sp.linhas = len(df_out_final)
 
     sem = df_out_final[df_out_final["CNPJ"].astype(str).str.strip().eq("")].copy()
     if not sem.empty:
@@ -162,15 +132,15 @@ def main():
         )
         print("OK Auditoria sem match:", SEM_MATCH_CSV)
 
-    compactar(CONSOLIDADO_OUT, OUTPUT_ZIP)
-
     total = len(df_out_final)
     sem_match = int(df_out_final["CNPJ"].astype(str).str.strip().eq("").sum())
 
     print("OK Saída:", CONSOLIDADO_OUT)
     print("OK ZIP:", OUTPUT_ZIP)
     print(f"Linhas: {total} | Sem match de CNPJ: {sem_match}")
+    anotar("cache_limpar_texto", info_cache_texto())
 
 
 if __name__ == "__main__":
-    main()
+    with execucao("enrich_cadop"):
+        main()
@@ -0,0 +1,123 @@
+#exportar_parquet.py
+
+"""
+Exporta as tabelas da API para Parquet (modo DuckDB do backend).
+
+Mesmas tabelas e colunas que o import_postgres.py deixa no banco
+(dim_operadora, fato_despesas_consolidadas, despesas_agregadas,
+operadora_trimestre e operadora_resumo), montadas com os mesmos dados
+(tabelas.py) e o mesmo SQL de resumo, só que num DuckDB em memória.
+
+Com DB_MOTOR=duckdb a API lê estes arquivos localmente, sem Postgres.
+Cada arquivo é escrito ao lado com sufixo .tmp e trocado com os.replace,
+então quem ler a pasta nunca pega um Parquet pela metade.
+
+Uso:
+    python etl/exportar_parquet.py                     # data/output/parquet
+    python etl/exportar_parquet.py --destino /srv/ans  # outra pasta
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import duckdb
+
+from instrumentacao import execucao, span
+from tabelas import SQL_OPERADORA_RESUMO, SQL_OPERADORA_TRIMESTRE, ler_agregado, ler_dim, ler_fato
+
+PARQUET_DIR = Path("data/output/parquet")
+COMPRESSAO = os.getenv("PARQUET_COMPRESSAO", "zstd")
+
+# Tipos iguais aos do DDL do import_postgres.py (CHAR(n) vira VARCHAR)
+DDL = """
+CREATE TABLE dim_operadora (
+  cnpj          VARCHAR NOT NULL,
+  razao_social  VARCHAR NOT NULL,
+  uf            VARCHAR,
+  modalidade    VARCHAR
+);
+
+CREATE TABLE fato_despesas_consolidadas (
+  cnpj           VARCHAR NOT NULL,
+  registro_ans   VARCHAR NOT NULL,
+  trimestre      SMALLINT NOT NULL,
+  ano            SMALLINT NOT NULL,
+  valor_despesas NUMERIC(18,2) NOT NULL
+);
+
+CREATE TABLE despesas_agregadas (
+  razao_social     VARCHAR NOT NULL,
+  uf               VARCHAR NOT NULL,
+  total_despesas   NUMERIC(18,2) NOT NULL,
+  media_trimestral NUMERIC(18,2) NOT NULL,
+  desvio_padrao    NUMERIC(18,2) NOT NULL,
+  n_linhas         INTEGER,
+  n_validos        INTEGER
+);
+"""
+
+# tabela -> ordem das linhas no arquivo (estatísticas de row group por cnpj/período)
+TABELAS = {
+    "dim_operadora": "cnpj",
+    "fato_despesas_consolidadas": "ano, trimestre, cnpj",
+    "despesas_agregadas": "total_despesas DESC, razao_social, uf",
+    "operadora_trimestre": "cnpj, ano, trimestre",
+    "operadora_resumo": "rank_nacional, cnpj",
+}
+
+
+def carregar(con, tabela: str, df):
+    with span("carregar", arquivo=tabela) as sp:
+        con.register("df_entrada", df)
+        colunas = ", ".join(df.columns)
+        con.execute(f"INSERT INTO {tabela} ({colunas}) SELECT {colunas} FROM df_entrada")
+        con.unregister("df_entrada")
+        sp.linhas = len(df)
+    print(f"   {tabela}: {len(df)} linhas")
+
+
+def exportar(destino: Path = PARQUET_DIR) -> list[Path]:
+    con = duckdb.connect()
+    con.execute(DDL)
+
+    print("1/3) Carregando tabelas a partir dos CSVs...")
+    carregar(con, "dim_operadora", ler_dim())
+    carregar(con, "fato_despesas_consolidadas", ler_fato())
+    carregar(con, "despesas_agregadas", ler_agregado())
+
+    print("2/3) Calculando operadora_trimestre/operadora_resumo...")
+    with span("resumo"):
+        con.execute(f"CREATE TABLE operadora_trimestre AS {SQL_OPERADORA_TRIMESTRE}")
+        con.execute(f"CREATE TABLE operadora_resumo AS {SQL_OPERADORA_RESUMO.format(s='')}")
+
+    print(f"3/3) Gravando Parquet em {destino}...")
+    destino.mkdir(parents=True, exist_ok=True)
+    arquivos = []
+    for tabela, ordem in TABELAS.items():
+        final = destino / f"{tabela}.parquet"
+        tmp = final.with_name(final.name + ".tmp")
+        with span("gravar_parquet", arquivo=final) as sp:
+            con.execute(
+                f"COPY (SELECT * FROM {tabela} ORDER BY {ordem}) TO '{tmp.as_posix()}' "
+                f"(FORMAT parquet, COMPRESSION {COMPRESSAO})"
+            )
+            os.replace(tmp, final)
+            sp.linhas = con.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+        print(f"   OK {final} ({sp.linhas} linhas)")
+        arquivos.append(final)
+
+    con.close()
+    return arquivos
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Exporta as tabelas da API para Parquet (modo DuckDB).")
+    ap.add_argument("--destino", type=Path, default=PARQUET_DIR, help=f"pasta de saída (padrão: {PARQUET_DIR})")
+    args = ap.parse_args(argv)
+    exportar(args.destino)
+
+
+if __name__ == "__main__":
+    with execucao("exportar_parquet"):
+        main()
@@ -0,0 +1,268 @@
+#gerar_dados_sinteticos.py
+
+"""
+Gera dados sintéticos no formato da ANS para testar/medir o ETL sem internet.
+
+Dentro de DESTINO cria:
+- data/raw/<ano>_T<tri>_<tri>T<ano>.zip   demonstrações contábeis (um CSV por trimestre)
+- data/raw/cadop/Relatorio_cadop.csv     operadoras ativas
+- data/raw/cadop/Relatorio_cadop_canceladas.csv
+
+Como nos arquivos reais, os trimestres variam de encoding (utf-8, utf-8-sig,
+latin1) e separador (";" ou ","), os valores vêm em formato brasileiro
+("1.234,56" / "1234,56") e há REG_ANS sem cadastro no CADOP e CNPJ com máscara.
+
+Escala 1 = volume atual do ETL (3 trimestres, ~1.100 operadoras ativas,
+~700 mil linhas por trimestre); a escala multiplica o número de operadoras.
+
+Uso:
+    python etl/gerar_dados_sinteticos.py /tmp/ans_sintetico --escala 10
+"""
+
+import argparse
+import csv
+import io
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from download_ans import parse_trimestre
+
+OPERADORAS_ATIVAS_BASE = 1_100
+OPERADORAS_CANCELADAS_BASE = 300
+CONTAS_POR_OPERADORA = 640
+TRIMESTRES_BASE = [(2024, 4), (2025, 1), (2025, 2)]
+# fração de operadoras que aparecem nas demonstrações sem estar no CADOP
+FRACAO_SEM_CADOP = 0.01
+OPERADORAS_POR_BLOCO = 200
+
+# (encoding, separador, milhar) de cada trimestre, em rodízio
+FORMATOS_TRIMESTRE = [
+    ("utf-8", ";", True),
+    ("latin1", ";", False),
+    ("utf-8-sig", ",", True),
+]
+
+UFS = ["SP", "RJ", "MG", "RS", "PR", "SC", "BA", "PE", "CE", "GO", "DF", "ES", "PA", "AM", "MT", "MS"]
+MODALIDADES = [
+    "Cooperativa Médica",
+    "Medicina de Grupo",
+    "Odontologia de Grupo",
+    "Seguradora Especializada em Saúde",
+    "Autogestão",
+    "Filantropia",
+    "Cooperativa Odontológica",
+    "Administradora de Benefícios",
+]
+NOMES = ["SAÚDE", "ASSISTÊNCIA MÉDICA", "ODONTOLÓGICA", "UNIMED", "CLÍNICA", "HOSPITAL SÃO JOSÉ", "PLANOS"]
+SUFIXOS = ["LTDA", "S.A.", "COOPERATIVA DE TRABALHO MÉDICO", "ASSOCIAÇÃO", "EIRELI"]
+
+# Contas que o process_files filtra (evento/sinistro) e contas que ele descarta
+CONTAS_EVENTOS = [
+    "EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA A SAÚDE MEDICO HOSPITALAR",
+    "Eventos Indenizáveis Líquidos / Sinistros Retidos",
+    "EVENTOS/SINISTROS CONHECIDOS OU AVISADOS - CONSULTAS MÉDICAS",
+    "Sinistros a Liquidar - Exames",
+    "EVENTOS / SINISTROS - INTERNAÇÕES",
+]
+CONTAS_OUTRAS = [
+    "CONTRAPRESTAÇÕES EFETIVAS DE PLANO DE ASSISTÊNCIA À SAÚDE",
+    "Receitas com Operações de Assistência à Saúde",
+    "DESPESAS ADMINISTRATIVAS",
+    "Provisões Técnicas de Operações de Assistência à Saúde",
+    "Aplicações Financeiras",
+    "Tributos Diretos de Operações com Planos de Assistência à Saúde",
+    "DÉBITOS COM OPERAÇÕES DE ASSISTÊNCIA À SAÚDE",
+    "Despesas de Comercialização",
+]
+COLUNAS_DEMONSTRACAO = ["DATA", "REG_ANS", "CD_CONTA_CONTABIL", "DESCRICAO", "VL_SALDO_INICIAL", "VL_SALDO_FINAL"]
+
+
+def plano_de_contas(n: int) -> pd.DataFrame:
+    """~1 em cada 8 contas é de evento/sinistro, como no plano da ANS."""
+    codigos, descricoes = [], []
+    for i in range(n):
+        if i % 8 == 0:
+            desc = CONTAS_EVENTOS[(i // 8) % len(CONTAS_EVENTOS)]
+            codigos.append(f"41{i:07d}")
+        else:
+            desc = CONTAS_OUTRAS[i % len(CONTAS_OUTRAS)]
+            codigos.append(f"{(i % 3) + 1}{i:08d}")
+        descricoes.append(desc)
+    return pd.DataFrame({"CD_CONTA_CONTABIL": codigos, "DESCRICAO": descricoes})
+
+
+def valor_br(centavos: np.ndarray, milhar: bool) -> list[str]:
+    out = []
+    for c in centavos.tolist():
+        sinal = "-" if c < 0 else ""
+        c = abs(c)
+        inteiro = f"{c // 100:,}".replace(",", ".") if milhar else str(c // 100)
+        out.append(f"{sinal}{inteiro},{c % 100:02d}")
+    return out
+
+
+def registro(i: int) -> int:
+    return 300_000 + i
+
+
+def cnpj(i: int) -> str:
+    return f"{10_000_000 + i:08d}0001{i % 97:02d}"
+
+
+def cnpj_com_mascara(c: str) -> str:
+    return f"{c[:2]}.{c[2:5]}.{c[5:8]}/{c[8:12]}-{c[12:]}"
+
+
+def operadoras(escala: int) -> tuple[range, range, range]:
+    """Índices de ativas, canceladas e sem cadastro (apenas nas demonstrações)."""
+    n_ativas = OPERADORAS_ATIVAS_BASE * escala
+    n_canceladas = OPERADORAS_CANCELADAS_BASE * escala
+    n_sem = max(1, int(n_ativas * FRACAO_SEM_CADOP))
+    ativas = range(1, n_ativas + 1)
+    canceladas = range(n_ativas + 1, n_ativas + n_canceladas + 1)
+    sem_cadop = range(n_ativas + n_canceladas + 1, n_ativas + n_canceladas + n_sem + 1)
+    return ativas, canceladas, sem_cadop
+
+
+def gerar_cadop(destino: Path, escala: int, rng: np.random.Generator) -> list[Path]:
+    cadop_dir = destino / "data" / "raw" / "cadop"
+    cadop_dir.mkdir(parents=True, exist_ok=True)
+    ativas, canceladas, _ = operadoras(escala)
+    colunas = ["REGISTRO_OPERADORA", "CNPJ", "Razao_Social", "Nome_Fantasia", "Modalidade", "Cidade", "UF", "Data_Registro_ANS"]
+
+    arquivos = []
+    # ativas em UTF-8 e canceladas em latin1: o cadop.py lê tudo como latin1 e o
+    # limpar_texto (ftfy) precisa consertar o mojibake das ativas
+    for nome, idx, encoding in (
+        ("Relatorio_cadop.csv", ativas, "utf-8"),
+        ("Relatorio_cadop_canceladas.csv", canceladas, "latin1"),
+    ):
+        n = len(idx)
+        cnpjs = [cnpj(i) for i in idx]
+        # parte dos CNPJs vem com máscara
+        cnpjs = [cnpj_com_mascara(c) if i % 5 == 0 else c for i, c in zip(idx, cnpjs)]
+        df = pd.DataFrame(
+            {
+                "REGISTRO_OPERADORA": [str(registro(i)) for i in idx],
+                "CNPJ": cnpjs,
+                "Razao_Social": [
+                    f"{NOMES[i % len(NOMES)]} {i} {SUFIXOS[i % len(SUFIXOS)]}" for i in idx
+                ],
+                "Nome_Fantasia": [f"{NOMES[i % len(NOMES)].title()} {i}" for i in idx],
+                "Modalidade": rng.choice(MODALIDADES, size=n),
+                "Cidade": rng.choice(["São Paulo", "Rio de Janeiro", "Belo Horizonte", "Belém", "Goiânia"], size=n),
+                "UF": rng.choice(UFS, size=n),
+                "Data_Registro_ANS": [f"{2000 + i % 24}-{i % 12 + 1:02d}-01" for i in idx],
+            },
+            columns=colunas,
+        )
+        path = cadop_dir / nome
+        df.to_csv(path, sep=";", index=False, encoding=encoding, quoting=csv.QUOTE_MINIMAL)
+        arquivos.append(path)
+    return arquivos
+
+
+def gerar_trimestre(
+    destino: Path,
+    ano: int,
+    tri: int,
+    regs: np.ndarray,
+    plano: pd.DataFrame,
+    formato: tuple[str, str, bool],
+    rng: np.random.Generator,
+) -> Path:
+    encoding, sep, milhar = formato
+    raw_dir = destino / "data" / "raw"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    zip_path = raw_dir / f"{ano}_T{tri}_{tri}T{ano}.zip"
+    data = f"{ano}-{(tri - 1) * 3 + 1:02d}-01"
+    n_contas = len(plano)
+
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+        with z.open(f"{tri}T{ano}.csv", "w", force_zip64=True) as bruto:
+            texto = io.TextIOWrapper(bruto, encoding=encoding, newline="")
+            for inicio in range(0, len(regs), OPERADORAS_POR_BLOCO):
+                bloco = regs[inicio:inicio + OPERADORAS_POR_BLOCO]
+                n = len(bloco) * n_contas
+                # saldos em centavos, com alguns negativos (estornos)
+                inicial = rng.integers(-5_000_000, 500_000_000, size=n)
+                final = rng.integers(-5_000_000, 500_000_000, size=n)
+                df = pd.DataFrame(
+                    {
+                        "DATA": data,
+                        "REG_ANS": np.repeat(bloco, n_contas).astype(str),
+                        "CD_CONTA_CONTABIL": np.tile(plano["CD_CONTA_CONTABIL"].to_numpy(), len(bloco)),
+                        "DESCRICAO": np.tile(plano["DESCRICAO"].to_numpy(), len(bloco)),
+                        "VL_SALDO_INICIAL": valor_br(inicial, milhar),
+                        "VL_SALDO_FINAL": valor_br(final, milhar),
+                    },
+                    columns=COLUNAS_DEMONSTRACAO,
+                )
+                df.to_csv(texto, sep=sep, index=False, header=inicio == 0, quoting=csv.QUOTE_ALL)
+            texto.flush()
+            texto.detach()
+    return zip_path
+
+
+def gerar(
+    destino: Path,
+    escala: int = 1,
+    trimestres: list[tuple[int, int]] | None = None,
+    contas_por_operadora: int = CONTAS_POR_OPERADORA,
+    seed: int = 42,
+) -> dict:
+    """Gera ZIPs + CADOP em `destino`. Retorna um resumo com arquivos e linhas."""
+    trimestres = trimestres or TRIMESTRES_BASE
+    rng = np.random.default_rng(seed)
+    plano = plano_de_contas(contas_por_operadora)
+    ativas, canceladas, sem_cadop = operadoras(escala)
+
+    cadop = gerar_cadop(destino, escala, rng)
+
+    zips = []
+    linhas = 0
+    for n, (ano, tri) in enumerate(trimestres):
+        # canceladas só aparecem no trimestre mais antigo
+        idx = [*ativas, *sem_cadop] + ([*canceladas] if n == 0 else [])
+        regs = np.array([registro(i) for i in idx], dtype=np.int64)
+        formato = FORMATOS_TRIMESTRE[n % len(FORMATOS_TRIMESTRE)]
+        print(f"  -> {ano} T{tri}: {len(regs)} operadoras ({formato[0]}, sep '{formato[1]}')")
+        zips.append(gerar_trimestre(destino, ano, tri, regs, plano, formato, rng))
+        linhas += len(regs) * len(plano)
+
+    return {
+        "escala": escala,
+        "zips": [str(p) for p in zips],
+        "cadop": [str(p) for p in cadop],
+        "linhas_demonstracoes": linhas,
+        "bytes": sum(Path(p).stat().st_size for p in [*zips, *cadop]),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Gera demonstrações contábeis e CADOP sintéticos.")
+    ap.add_argument("destino", type=Path, help="pasta onde criar data/raw/")
+    ap.add_argument("--escala", type=int, default=1, help="multiplicador do volume atual (padrão: 1)")
+    ap.add_argument(
+        "--trimestre",
+        type=parse_trimestre,
+        action="append",
+        metavar="AAAATn",
+        help="trimestres a gerar (repetível; padrão: 2024T4 2025T1 2025T2)",
+    )
+    ap.add_argument("--contas", type=int, default=CONTAS_POR_OPERADORA, help="linhas por operadora/trimestre")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    resumo = gerar(args.destino, args.escala, args.trimestre, args.contas, args.seed)
+    print(
+        f"OK {resumo['linhas_demonstracoes']} linhas em {len(resumo['zips'])} ZIPs "
+        f"({resumo['bytes'] / 1024 / 1024:.1f} MB) em {args.destino}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,171 +1,440 @@
+import argparse
 import os
 import pandas as pd
 from sqlalchemy import create_engine, text
-from sqlalchemy.types import String, Text, Numeric, SmallInteger
 
+from carga_postgres import copiar_dataframe, registrar_carga, url_postgres
+from download_ans import parse_trimestre
+from instrumentacao import execucao, span
+from tabelas import SQL_OPERADORA_RESUMO, SQL_OPERADORA_TRIMESTRE, ler_agregado, ler_dim, ler_fato
 
-PG_HOST = os.getenv("POSTGRES_HOST", "localhost")
-PG_PORT = os.getenv("POSTGRES_PORT", "5432")
-PG_DB   = os.getenv("POSTGRES_DB", "ans_db")
-PG_USER = os.getenv("POSTGRES_USER", "postgres")
-PG_PASS = os.getenv("POSTGRES_PASSWORD")
 
-if not PG_PASS:
+# POSTGRES_HOST/PORT/DB/USER/PASSWORD (carga_postgres.url_postgres)
+PG_URL = url_postgres()
+
+if not PG_URL:
     raise RuntimeError(
         "POSTGRES_PASSWORD não definido. "
         "Defina a variável de ambiente POSTGRES_PASSWORD e rode novamente."
     )
 
-engine = create_engine(f"postgresql://{PG_USER}:{PG_PASS}@{PG_HOST}:{PG_PORT}/{PG_DB}")
+engine = create_engine(PG_URL)
+
+# csv (padrão) ou binary
+COPY_FORMATO = os.getenv("POSTGRES_COPY_FORMATO", "csv")
+
+# Carga em tabelas *_staging (UNLOGGED por padrão) e troca atômica no fim:
+# a API nunca enxerga tabela vazia ou pela metade durante o import.
+SUFIXO_STAGING = "_staging"
+STAGING_UNLOGGED = os.getenv("POSTGRES_STAGING_UNLOGGED", "1") == "1"
+# Com "1", as tabelas finais continuam UNLOGGED (mais rápido; somem num crash do
+# banco e precisam de novo import). Padrão: SET LOGGED antes da troca.
+MANTER_UNLOGGED = os.getenv("POSTGRES_MANTER_UNLOGGED", "0") == "1"
 
-PATH_DIM = "data/output/consolidado_despesas_validado_enriquecido.csv"
-PATH_FATO = "data/output/consolidado_despesas_enriquecido.csv"
-PATH_AGG = "data/output/despesas_agregadas.csv"
+# dim_operadora e despesas_agregadas são recriadas inteiras a cada import;
+# a fato é particionada por (ano, trimestre) e recebe só trimestres novos
+# (no modo incremental a agregada é recalculada da fato: SQL_AGREGADAS_DA_FATO).
+TABELAS = ["dim_operadora", "despesas_agregadas"]
+FATO = "fato_despesas_consolidadas"
 
+# Nomes explícitos (com {s}) para poder renomear tudo na troca
+INDICES = [
+    "dim_operadora_pkey",
+    "despesas_agregadas_pkey",
+    "idx_agregadas_total_desc",
+]
+INDICES_FATO = ["fato_despesas_consolidadas_pkey", "idx_fato_cnpj_periodo"]
+SEQUENCIAS_FATO = [("fato_despesas_consolidadas{s}_id_seq", "fato_despesas_consolidadas_id_seq")]
+
+# Tabelas sem PK/índices: tudo isso é criado depois da carga (DDL_INDICES),
+# que é bem mais barato do que manter índice linha a linha no COPY.
 DDL = """
-DROP TABLE IF EXISTS despesas_agregadas CASCADE;
-DROP TABLE IF EXISTS fato_despesas_consolidadas CASCADE;
-DROP TABLE IF EXISTS dim_operadora CASCADE;
+DROP TABLE IF EXISTS despesas_agregadas{s} CASCADE;
+DROP TABLE IF EXISTS dim_operadora{s} CASCADE;
 
-CREATE TABLE dim_operadora (
-  cnpj          CHAR(14) PRIMARY KEY,
+CREATE {unlogged} TABLE dim_operadora{s} (
+  cnpj          CHAR(14) NOT NULL,
   razao_social  TEXT NOT NULL,
   uf            CHAR(2),
   modalidade    TEXT
 );
 
-CREATE TABLE fato_despesas_consolidadas (
-  id             BIGSERIAL PRIMARY KEY,
-  cnpj           CHAR(14) NOT NULL REFERENCES dim_operadora(cnpj),
-  registro_ans   VARCHAR(20) NOT NULL,
-  trimestre      SMALLINT NOT NULL CHECK (trimestre BETWEEN 1 AND 4),
-  ano            SMALLINT NOT NULL,
-  valor_despesas NUMERIC(18,2) NOT NULL
-);
-
-CREATE INDEX idx_fato_cnpj_periodo ON fato_despesas_consolidadas (cnpj, ano, trimestre);
-
-CREATE TABLE despesas_agregadas (
+CREATE {unlogged} TABLE despesas_agregadas{s} (
   razao_social     TEXT NOT NULL,
   uf               CHAR(2) NOT NULL,
   total_despesas   NUMERIC(18,2) NOT NULL,
   media_trimestral NUMERIC(18,2) NOT NULL,
   desvio_padrao    NUMERIC(18,2) NOT NULL,
   n_linhas         INTEGER,
-  n_validos        INTEGER,
-  PRIMARY KEY (razao_social, uf)
+  n_validos        INTEGER
 );
+"""
+
+DDL_INDICES = """
+ALTER TABLE dim_operadora{s}
+  ADD CONSTRAINT dim_operadora_pkey{s} PRIMARY KEY (cnpj);
+
+ALTER TABLE despesas_agregadas{s}
+  ADD CONSTRAINT despesas_agregadas_pkey{s} PRIMARY KEY (razao_social, uf);
+CREATE INDEX idx_agregadas_total_desc{s} ON despesas_agregadas{s} (total_despesas DESC);
+
+ANALYZE dim_operadora{s};
+ANALYZE despesas_agregadas{s};
+"""
+
+# Tabela mãe particionada (só é recriada no modo completo). Sem FK para
+# dim_operadora: a FK prenderia a dim e impediria a troca dela por staging.
+# O nome da CHECK não leva {s}: o ATTACH exige que a partição tenha as mesmas
+# CHECKs da mãe, com o mesmo nome.
+DDL_FATO = """
+DROP TABLE IF EXISTS fato_despesas_consolidadas{s} CASCADE;
+
+CREATE TABLE fato_despesas_consolidadas{s} (
+  id             BIGSERIAL,
+  cnpj           CHAR(14) NOT NULL,
+  registro_ans   VARCHAR(20) NOT NULL,
+  trimestre      SMALLINT NOT NULL
+    CONSTRAINT fato_despesas_consolidadas_trimestre_check CHECK (trimestre BETWEEN 1 AND 4),
+  ano            SMALLINT NOT NULL,
+  valor_despesas NUMERIC(18,2) NOT NULL,
+  CONSTRAINT fato_despesas_consolidadas_pkey{s} PRIMARY KEY (id, ano, trimestre)
+) PARTITION BY RANGE (ano, trimestre);
 
-CREATE INDEX idx_agregadas_total_desc ON despesas_agregadas (total_despesas DESC);
+CREATE INDEX idx_fato_cnpj_periodo{s} ON fato_despesas_consolidadas{s} (cnpj, ano, trimestre);
 """
 
-def only_digits(s: str) -> str:
+# Partição avulsa de um trimestre: carregada e indexada fora da mãe e só
+# anexada na troca. A CHECK de período evita o scan de validação no ATTACH.
+DDL_PARTICAO = """
+DROP TABLE IF EXISTS {part}{s};
+
+CREATE {unlogged} TABLE {part}{s}
+  (LIKE {mae} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+
+ALTER TABLE {part}{s}
+  ADD CONSTRAINT {part}_periodo CHECK (ano = {ano} AND trimestre = {tri});
+"""
+
+DDL_INDICES_PARTICAO = """
+ALTER TABLE {part}{s}
+  ADD CONSTRAINT {part}_pkey{s} PRIMARY KEY (id, ano, trimestre);
+CREATE INDEX {part}_cnpj_periodo{s} ON {part}{s} (cnpj, ano, trimestre);
+
+ANALYZE {part}{s};
+"""
+
+# Modo incremental: operadoras que só aparecem em trimestres antigos continuam na dim
+SQL_MANTER_OPERADORAS_ANTIGAS = """
+INSERT INTO dim_operadora{s} (cnpj, razao_social, uf, modalidade)
+SELECT d.cnpj, d.razao_social, d.uf, d.modalidade
+FROM dim_operadora d
+WHERE NOT EXISTS (SELECT 1 FROM dim_operadora{s} n WHERE n.cnpj = d.cnpj)
+"""
+
+# Modo incremental: o despesas_agregadas.csv só cobre os trimestres do CSV atual,
+# mas a fato guarda todos os já carregados. A agregada sai da fato inteira
+# (partições que ficam + as novas em staging), com a mesma regra do
+# agregar_e_zipar.py: por (razão social, UF) da dim, desvio 0 com um valor só.
+# Linha sem valor não chega à fato, então aqui n_linhas = n_validos.
+SQL_AGREGADAS_DA_FATO = """
+INSERT INTO despesas_agregadas{s}
+  (razao_social, uf, total_despesas, media_trimestral, desvio_padrao, n_linhas, n_validos)
+SELECT
+  d.razao_social,
+  COALESCE(d.uf, '') AS uf,
+  SUM(f.valor_despesas)::NUMERIC(18,2),
+  AVG(f.valor_despesas)::NUMERIC(18,2),
+  COALESCE(STDDEV_SAMP(f.valor_despesas), 0)::NUMERIC(18,2),
+  COUNT(*),
+  COUNT(f.valor_despesas)
+FROM ({fato}) f
+JOIN dim_operadora{s} d ON d.cnpj = f.cnpj
+WHERE TRIM(d.razao_social) <> ''
+GROUP BY d.razao_social, COALESCE(d.uf, '')
+"""
+
+# Tabelas derivadas da fato, recalculadas inteiras depois de cada import (a fato
+# pode ter recebido só alguns trimestres). Servem a listagem/ranking da API sem
+# agregar a fato a cada página.
+TABELAS_RESUMO = ["operadora_trimestre", "operadora_resumo"]
+INDICES_RESUMO = [
+    "operadora_trimestre_pkey",
+    "operadora_resumo_pkey",
+    "idx_resumo_rank_nacional",
+    "idx_resumo_uf_rank",
+    "idx_resumo_razao_social",
+    "idx_resumo_ultimo_desc",
+    "idx_resumo_variacao_desc",
+]
+
+# SELECTs em tabelas.py (os mesmos do exportar_parquet.py)
+DDL_RESUMO = f"""
+DROP TABLE IF EXISTS operadora_resumo{{s}};
+DROP TABLE IF EXISTS operadora_trimestre{{s}};
+
+-- série por operadora/trimestre (historico_despesas)
+CREATE {{unlogged}} TABLE operadora_trimestre{{s}} AS
+{SQL_OPERADORA_TRIMESTRE};
+
+CREATE {{unlogged}} TABLE operadora_resumo{{s}} AS
+{SQL_OPERADORA_RESUMO};
+"""
+
+# Depois do SET LOGGED: índice criado em tabela já LOGGED vai uma vez só para o
+# WAL (o SET LOGGED reescreve heap e todos os índices existentes)
+DDL_INDICES_RESUMO = """
+ALTER TABLE operadora_trimestre{s}
+  ADD CONSTRAINT operadora_trimestre_pkey{s} PRIMARY KEY (cnpj, ano, trimestre);
+
+ALTER TABLE operadora_resumo{s}
+  ADD CONSTRAINT operadora_resumo_pkey{s} PRIMARY KEY (cnpj);
+CREATE INDEX idx_resumo_rank_nacional{s} ON operadora_resumo{s} (rank_nacional, cnpj);
+CREATE INDEX idx_resumo_uf_rank{s} ON operadora_resumo{s} (uf, rank_uf, cnpj);
+CREATE INDEX idx_resumo_razao_social{s} ON operadora_resumo{s} (razao_social, cnpj);
+CREATE INDEX idx_resumo_ultimo_desc{s} ON operadora_resumo{s} (valor_ultimo_trimestre DESC NULLS LAST, cnpj);
+CREATE INDEX idx_resumo_variacao_desc{s} ON operadora_resumo{s} (variacao_trimestral DESC NULLS LAST, cnpj);
+
+ANALYZE operadora_trimestre{s};
+ANALYZE operadora_resumo{s};
+"""
+
+# Tipos por coluna para o COPY binário
+TIPOS_COPY = {
+    "dim_operadora": {"cnpj": "text", "razao_social": "text", "uf": "text", "modalidade": "text"},
+    "fato_despesas_consolidadas": {
+        "cnpj": "text",
+        "registro_ans": "text",
+        "trimestre": "int2",
+        "ano": "int2",
+        "valor_despesas": "numeric",
+    },
+    "despesas_agregadas": {
+        "razao_social": "text",
+        "uf": "text",
+        "total_despesas": "numeric",
+        "media_trimestral": "numeric",
+        "desvio_padrao": "numeric",
+        "n_linhas": "int4",
+        "n_validos": "int4",
+    },
+}
+
+def nome_particao(ano: int, tri: int) -> str:
+    return f"{FATO}_{ano}_t{tri}"
+
+def estado_fato(conn) -> str:
+    """'ausente', 'heap' (schema antigo, sem partições) ou 'particionada'."""
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": FATO}
+    ).scalar()
+    if relkind is None:
+        return "ausente"
+    return "particionada" if relkind == "p" else "heap"
+
+def trimestres_carregados(conn) -> set[tuple[int, int]]:
     import re
-    return re.sub(r"\D", "", "" if s is None else str(s))
+    nomes = conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:t)
+            """
+        ),
+        {"t": FATO},
+    ).scalars().all()
+    out = set()
+    for nome in nomes:
+        m = re.fullmatch(rf"{FATO}_(\d{{4}})_t([1-4])", nome)
+        if m:
+            out.add((int(m.group(1)), int(m.group(2))))
+    return out
 
-def main():
-    print("Recriando schema (DDL tipado)...")
-    with engine.connect() as conn:
-        conn.execute(text(DDL))
+def sql_trocar_tabelas(
+    particoes: list[tuple[int, int]], fato_completa: bool, s: str = SUFIXO_STAGING
+) -> str:
+    """
+    Uma transação: derruba as tabelas antigas e renomeia as *_staging
+    (tabelas, índices e sequência) para os nomes finais; depois troca/anexa
+    as partições novas da fato. Leitores que estavam esperando o lock já
+    resolvem o nome para a tabela nova.
+    """
+    cmds = ["SET LOCAL lock_timeout = '30s';"]
+    cmds += [f"DROP TABLE IF EXISTS {t} CASCADE;" for t in reversed(TABELAS)]
+    cmds += [f"ALTER TABLE {t}{s} RENAME TO {t};" for t in TABELAS]
+    cmds += [f"ALTER INDEX {i}{s} RENAME TO {i};" for i in INDICES]
+
+    if fato_completa:
+        cmds.append(f"DROP TABLE IF EXISTS {FATO} CASCADE;")
+        cmds.append(f"ALTER TABLE {FATO}{s} RENAME TO {FATO};")
+        cmds += [f"ALTER INDEX {i}{s} RENAME TO {i};" for i in INDICES_FATO]
+        cmds += [f"ALTER SEQUENCE {de.format(s=s)} RENAME TO {para};" for de, para in SEQUENCIAS_FATO]
+
+    for ano, tri in particoes:
+        part = nome_particao(ano, tri)
+        cmds.append(f"DROP TABLE IF EXISTS {part};")
+        cmds.append(f"ALTER TABLE {part}{s} RENAME TO {part};")
+        cmds.append(f"ALTER INDEX {part}_pkey{s} RENAME TO {part}_pkey;")
+        cmds.append(f"ALTER INDEX {part}_cnpj_periodo{s} RENAME TO {part}_cnpj_periodo;")
+        cmds.append(
+            f"ALTER TABLE {FATO} ATTACH PARTITION {part} "
+            f"FOR VALUES FROM ({ano}, {tri}) TO ({ano}, {tri + 1});"
+        )
+    return "\n".join(cmds)
+
+def sql_agregadas_da_fato(particoes: list[tuple[int, int]], s: str = SUFIXO_STAGING) -> str:
+    """INSERT da agregada a partir da fato como ela fica depois da troca."""
+    fora = ", ".join(f"({a}, {t})" for a, t in particoes)
+    partes = [f"SELECT cnpj, valor_despesas FROM {FATO}" + (f" WHERE (ano, trimestre) NOT IN ({fora})" if fora else "")]
+    partes += [f"SELECT cnpj, valor_despesas FROM {nome_particao(a, t)}{s}" for a, t in particoes]
+    return SQL_AGREGADAS_DA_FATO.format(s=s, fato="\n  UNION ALL\n  ".join(partes))
+
+def sql_trocar_resumo(s: str = SUFIXO_STAGING) -> str:
+    cmds = ["SET LOCAL lock_timeout = '30s';"]
+    cmds += [f"DROP TABLE IF EXISTS {t};" for t in reversed(TABELAS_RESUMO)]
+    cmds += [f"ALTER TABLE {t}{s} RENAME TO {t};" for t in TABELAS_RESUMO]
+    cmds += [f"ALTER INDEX {i}{s} RENAME TO {i};" for i in INDICES_RESUMO]
+    return "\n".join(cmds)
+
+def atualizar_resumo(unlogged: str, s: str = SUFIXO_STAGING):
+    """Recalcula operadora_trimestre/operadora_resumo a partir das tabelas finais."""
+    with span("resumo"), engine.connect() as conn:
+        conn.execute(text(DDL_RESUMO.format(s=s, unlogged=unlogged)))
+        if unlogged and not MANTER_UNLOGGED:
+            for t in TABELAS_RESUMO:
+                conn.execute(text(f"ALTER TABLE {t}{s} SET LOGGED"))
+        conn.execute(text(DDL_INDICES_RESUMO.format(s=s)))
         conn.commit()
+    with engine.begin() as conn:
+        conn.execute(text(sql_trocar_resumo(s)))
 
-    # 1) DIM_OPERADORA
-    print("1/3) Importando dim_operadora...")
-    df_dim = pd.read_csv(PATH_DIM, encoding="utf-8-sig", dtype=str)
-    df_dim = (
-        df_dim[["CNPJ", "RazaoSocial", "UF", "Modalidade"]]
-        .drop_duplicates("CNPJ")
-        .rename(columns={"CNPJ": "cnpj", "RazaoSocial": "razao_social", "UF": "uf", "Modalidade": "modalidade"})
-    )
-    df_dim["cnpj"] = df_dim["cnpj"].apply(only_digits)
-    df_dim = df_dim[df_dim["cnpj"].str.len() == 14]
-
-    df_dim.to_sql(
-        "dim_operadora",
-        engine,
-        if_exists="append",
-        index=False,
-        dtype={
-            "cnpj": String(14),
-            "razao_social": Text(),
-            "uf": String(2),
-            "modalidade": Text(),
-        },
-        method="multi",
-        chunksize=2000,
-    )  # dtype ajuda a respeitar o schema [web:647]
-    print(f"   OK: {len(df_dim)} operadoras")
-
-    # 2) FATO
-    print("2/3) Importando fato_despesas_consolidadas...")
-    df_fato = pd.read_csv(PATH_FATO, encoding="utf-8-sig", dtype=str)
-    df_fato = df_fato[["CNPJ", "RegistroANS", "Trimestre", "Ano", "ValorDespesas"]].rename(
-        columns={
-            "CNPJ": "cnpj",
-            "RegistroANS": "registro_ans",
-            "Trimestre": "trimestre",
-            "Ano": "ano",
-            "ValorDespesas": "valor_despesas",
-        }
+def carregar(tabela: str, df: pd.DataFrame, tipos: str | None = None) -> dict:
+    with span("copy", arquivo=tabela) as sp:
+        stats = copiar_dataframe(
+            engine, tabela + SUFIXO_STAGING, df, formato=COPY_FORMATO, tipos=TIPOS_COPY[tipos or tabela]
+        )
+        sp.linhas = stats["linhas"]
+    print(f"   OK: {stats['linhas']} linhas em {stats['segundos']:.2f}s ({stats['linhas_por_seg']:,.0f} linhas/s)")
+    return stats
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Importa os CSVs do ETL para o PostgreSQL.")
+    ap.add_argument(
+        "--substituir",
+        metavar="AAAATn",
+        type=parse_trimestre,
+        action="append",
+        default=[],
+        help="recarrega este trimestre mesmo que a partição já exista (pode repetir)",
     )
-    df_fato["cnpj"] = df_fato["cnpj"].apply(only_digits)
-    df_fato = df_fato[df_fato["cnpj"].str.len() == 14]
-    df_fato["trimestre"] = pd.to_numeric(df_fato["trimestre"], errors="coerce")
-    df_fato["ano"] = pd.to_numeric(df_fato["ano"], errors="coerce")
-    df_fato["valor_despesas"] = pd.to_numeric(df_fato["valor_despesas"], errors="coerce")
-
-    df_fato = df_fato.dropna(subset=["trimestre", "ano", "valor_despesas"])
-    df_fato["trimestre"] = df_fato["trimestre"].astype("int16")
-    df_fato["ano"] = df_fato["ano"].astype("int16")
-
-    # Garante 2 casas (NUMERIC(18,2))
-    df_fato["valor_despesas"] = df_fato["valor_despesas"].round(2)
-
-    df_fato.to_sql(
-        "fato_despesas_consolidadas",
-        engine,
-        if_exists="append",
-        index=False,
-        dtype={
-            "cnpj": String(14),
-            "registro_ans": String(20),
-            "trimestre": SmallInteger(),
-            "ano": SmallInteger(),
-            "valor_despesas": Numeric(18, 2),
-        },
-        method="multi",
-        chunksize=5000,
+    ap.add_argument(
+        "--completo",
+        action="store_true",
+        help="recria a fato inteira (todas as partições) a partir do CSV",
     )
-    print(f"   OK: {len(df_fato)} linhas")
-
-    # 3) AGREGADOS
-    print("3/3) Importando despesas_agregadas...")
-    df_agg = pd.read_csv(PATH_AGG, encoding="utf-8-sig", dtype=str)
-    # O CSV já sai com nomes: RazaoSocial, UF, total_despesas, media_trimestral, ...
-    df_agg = df_agg.rename(columns={"RazaoSocial": "razao_social", "UF": "uf"})
-    for col in ["total_despesas", "media_trimestral", "desvio_padrao", "n_linhas", "n_validos"]:
-        if col in df_agg.columns:
-            df_agg[col] = pd.to_numeric(df_agg[col], errors="coerce")
-    df_agg["uf"] = df_agg["uf"].fillna("").astype(str).str.strip()
-
-    df_agg.to_sql(
-        "despesas_agregadas",
-        engine,
-        if_exists="append",
-        index=False,
-        dtype={
-            "razao_social": Text(),
-            "uf": String(2),
-            "total_despesas": Numeric(18, 2),
-            "media_trimestral": Numeric(18, 2),
-            "desvio_padrao": Numeric(18, 2),
-        },
-        method="multi",
-        chunksize=5000,
+    ap.add_argument(
+        "--somente-resumo",
+        action="store_true",
+        help="só recalcula operadora_resumo/operadora_trimestre a partir do que já está no banco",
     )
-    print(f"   OK: {len(df_agg)} agregados")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    unlogged = "UNLOGGED" if STAGING_UNLOGGED else ""
+    s = SUFIXO_STAGING
+
+    if args.somente_resumo:
+        print("Recalculando operadora_resumo/operadora_trimestre...")
+        atualizar_resumo(unlogged)
+        print("OK")
+        return
+
+    df_dim = ler_dim()
+    df_fato = ler_fato()
+
+    # Quais trimestres entram nesta carga
+    no_csv = {(int(a), int(t)) for a, t in df_fato[["ano", "trimestre"]].drop_duplicates().itertuples(index=False)}
+    with engine.connect() as conn:
+        estado = estado_fato(conn)
+        ja_carregados = trimestres_carregados(conn) if estado == "particionada" else set()
+
+    fato_completa = args.completo or estado != "particionada"
+    if fato_completa:
+        particoes = sorted(no_csv)
+    else:
+        for tri in sorted(set(args.substituir) - no_csv):
+            print(f"AVISO: {tri[0]}T{tri[1]} não está no CSV; nada a substituir.")
+        particoes = sorted((no_csv - ja_carregados) | (set(args.substituir) & no_csv))
+
+    modo = "completo" if fato_completa else "incremental"
+    print(f"Fato ({modo}): trimestres a carregar = {[f'{a}T{t}' for a, t in particoes] or 'nenhum'}")
+
+    print("Criando tabelas de staging (DDL tipado)...")
+    with engine.connect() as conn:
+        conn.execute(text(DDL.format(s=s, unlogged=unlogged)))
+        if fato_completa:
+            conn.execute(text(DDL_FATO.format(s=s)))
+        mae = FATO + s if fato_completa else FATO
+        for ano, tri in particoes:
+            conn.execute(
+                text(DDL_PARTICAO.format(part=nome_particao(ano, tri), s=s, unlogged=unlogged, mae=mae, ano=ano, tri=tri))
+            )
+        conn.commit()
+
+    print("1/3) Importando dim_operadora...")
+    carregar("dim_operadora", df_dim)
+    if not fato_completa:
+        with engine.connect() as conn:
+            n = conn.execute(text(SQL_MANTER_OPERADORAS_ANTIGAS.format(s=s))).rowcount
+            conn.commit()
+        print(f"   +{n} operadoras mantidas de trimestres anteriores")
+
+    print("2/3) Importando fato_despesas_consolidadas...")
+    for ano, tri in particoes:
+        print(f"   {ano}T{tri}:")
+        df_tri = df_fato[(df_fato["ano"] == ano) & (df_fato["trimestre"] == tri)]
+        carregar(nome_particao(ano, tri), df_tri, tipos=FATO)
+
+    if fato_completa:
+        print("3/3) Importando despesas_agregadas...")
+        carregar("despesas_agregadas", ler_agregado())
+    else:
+        print("3/3) Recalculando despesas_agregadas a partir da fato (todos os trimestres)...")
+        with span("agregadas_da_fato") as sp, engine.connect() as conn:
+            sp.linhas = conn.execute(text(sql_agregadas_da_fato(particoes, s))).rowcount
+            conn.commit()
+        print(f"   OK: {sp.linhas} linhas")
+
+    # SET LOGGED antes dos índices: ele reescreve no WAL a tabela e todo índice
+    # que já existir; assim cada índice é construído (e logado) uma vez só
+    if STAGING_UNLOGGED and not MANTER_UNLOGGED:
+        print("Convertendo staging para LOGGED...")
+        with engine.connect() as conn:
+            for t in TABELAS + [nome_particao(a, t) for a, t in particoes]:
+                conn.execute(text(f"ALTER TABLE {t}{s} SET LOGGED"))
+            conn.commit()
+
+    print("Criando PK/índices e atualizando estatísticas (staging)...")
+    with span("indices_e_analyze"), engine.connect() as conn:
+        conn.execute(text(DDL_INDICES.format(s=s)))
+        for ano, tri in particoes:
+            conn.execute(text(DDL_INDICES_PARTICAO.format(part=nome_particao(ano, tri), s=s)))
+        conn.commit()
+
+    print("Trocando staging -> produção (transação única)...")
+    with span("troca_atomica"), engine.begin() as conn:
+        conn.execute(text(sql_trocar_tabelas(particoes, fato_completa)))
+        if not fato_completa:
+            conn.execute(text(f"ANALYZE {FATO}"))
+
+    print("Recalculando operadora_resumo/operadora_trimestre...")
+    atualizar_resumo(unlogged)
 
-    print("\nIMPORT FINALIZADO (schema tipado).")
+    carga_id = registrar_carga(engine)
+    print(f"\nIMPORT FINALIZADO (schema tipado). Carga {carga_id}.")
 
 if __name__ == "__main__":
-    main()
+    with execucao("import_postgres"):
+        main()
@@ -0,0 +1,307 @@
+#instrumentacao.py
+
+"""
+Instrumentação dos scripts do ETL.
+
+Uso num script:
+
+    with execucao("process_files"):
+        pipeline_parte1()
+
+e, nos trechos quentes:
+
+    with span("ler_dataframe", arquivo=path) as sp:
+        ...
+        sp.linhas = len(df)
+
+    @medir()
+    def filtrar_eventos_sinistros(df): ...
+
+Ao final da execução é gravado um JSON em data/output/perf/ com tempo por
+span (função) e por arquivo, linhas/s, pico de memória e, opcionalmente, um
+perfil (cProfile ou amostragem). Fora de `execucao()` os spans não fazem nada.
+
+Variáveis de ambiente:
+- ETL_PERF=0            desliga o relatório
+- ETL_PERF_DIR          pasta dos relatórios (padrão: data/output/perf)
+- ETL_PERFIL=cprofile   grava também o .prof e o top de funções no JSON
+- ETL_PERFIL=amostragem perfil por amostragem da thread principal (.folded)
+- ETL_EXECUCAO_ID       agrupa relatórios de uma mesma execução do pipeline
+"""
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PERF_DIR = Path(os.getenv("ETL_PERF_DIR", "data/output/perf"))
+TOP_FUNCOES = 30
+INTERVALO_AMOSTRAGEM = 0.005
+
+_relatorio = None
+
+
+def pico_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux devolve KB; macOS, bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Span:
+    __slots__ = ("nome", "arquivo", "linhas", "extra")
+
+    def __init__(self, nome: str, arquivo=None):
+        self.nome = nome
+        self.arquivo = arquivo
+        self.linhas = None
+        self.extra = {}
+
+
+class Relatorio:
+    def __init__(self, script: str):
+        self.script = script
+        self.execucao = os.getenv("ETL_EXECUCAO_ID") or uuid.uuid4().hex[:12]
+        self.inicio = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.t0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.spans: dict[str, dict] = {}
+        self.arquivos: list[dict] = []
+        self.contadores: Counter = Counter()
+        self.anotacoes: dict = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, sp: Span, segundos: float):
+        rss = pico_rss_mb()
+        with self._lock:
+            agg = self.spans.setdefault(
+                sp.nome, {"chamadas": 0, "segundos": 0.0, "max_segundos": 0.0, "linhas": 0}
+            )
+            agg["chamadas"] += 1
+            agg["segundos"] += segundos
+            agg["max_segundos"] = max(agg["max_segundos"], segundos)
+            if sp.linhas is not None:
+                agg["linhas"] += int(sp.linhas)
+            if rss is not None:
+                agg["pico_rss_mb"] = rss
+
+            if sp.arquivo is not None:
+                evento = {"span": sp.nome, "arquivo": str(sp.arquivo), "segundos": round(segundos, 6)}
+                if sp.linhas is not None:
+                    evento["linhas"] = int(sp.linhas)
+                    evento["linhas_por_seg"] = round(sp.linhas / segundos, 1) if segundos > 0 else None
+                evento.update(sp.extra)
+                self.arquivos.append(evento)
+
+    def como_dict(self, status: str) -> dict:
+        spans = {}
+        for nome, agg in sorted(self.spans.items(), key=lambda kv: -kv[1]["segundos"]):
+            d = dict(agg)
+            d["segundos"] = round(d["segundos"], 6)
+            d["max_segundos"] = round(d["max_segundos"], 6)
+            d["linhas_por_seg"] = round(d["linhas"] / agg["segundos"], 1) if d["linhas"] and agg["segundos"] > 0 else None
+            spans[nome] = d
+        return {
+            "script": self.script,
+            "execucao": self.execucao,
+            "inicio": self.inicio,
+            "status": status,
+            "segundos": round(time.perf_counter() - self.t0, 6),
+            "cpu_segundos": round(time.process_time() - self.cpu0, 6),
+            "pico_rss_mb": pico_rss_mb(),
+            "spans": spans,
+            "arquivos": self.arquivos,
+            "contadores": dict(self.contadores),
+            "anotacoes": self.anotacoes,
+        }
+
+
+class _SpanNulo:
+    """Aceita atribuições e não registra nada (instrumentação desligada)."""
+
+    __slots__ = ()
+    nome = arquivo = linhas = None
+
+    @property
+    def extra(self):
+        return {}
+
+    def __setattr__(self, chave, valor):
+        pass
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+@contextmanager
+def span(nome: str, arquivo=None):
+    rel = _relatorio
+    if rel is None:
+        yield _SPAN_NULO
+        return
+    sp = Span(nome, arquivo)
+    inicio = time.perf_counter()
+    try:
+        yield sp
+    finally:
+        rel.registrar(sp, time.perf_counter() - inicio)
+
+
+def medir(nome: str | None = None):
+    """Decorator: cria um span por chamada; conta linhas se o retorno tiver .shape."""
+
+    def deco(fn):
+        nome_span = nome or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _relatorio is None:
+                return fn(*args, **kwargs)
+            with span(nome_span) as sp:
+                out = fn(*args, **kwargs)
+                shape = getattr(out, "shape", None)
+                if shape:
+                    sp.linhas = shape[0]
+                return out
+
+        return wrapper
+
+    return deco
+
+
+def contar(nome: str, n: int = 1):
+    if _relatorio is not None:
+        _relatorio.contadores[nome] += n
+
+
+def anotar(nome: str, valor):
+    if _relatorio is not None:
+        _relatorio.anotacoes[nome] = valor
+
+
+class _Amostrador:
+    """Perfil por amostragem: lê a pilha da thread principal a cada intervalo."""
+
+    def __init__(self, intervalo: float = INTERVALO_AMOSTRAGEM):
+        self.intervalo = intervalo
+        self.alvo = threading.main_thread().ident
+        self.pilhas: Counter = Counter()
+        self.folhas: Counter = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._rodar, daemon=True)
+
+    def _rodar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.alvo)
+            if frame is None:
+                continue
+            pilha = []
+            while frame is not None:
+                code = frame.f_code
+                pilha.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.folhas[pilha[0]] += 1
+            self.pilhas[";".join(reversed(pilha))] += 1
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self, destino: Path) -> dict:
+        self._parar.set()
+        self._thread.join()
+        destino = destino.with_suffix(".folded")
+        with open(destino, "w", encoding="utf-8") as f:
+            for pilha, n in self.pilhas.most_common():
+                f.write(f"{pilha} {n}\n")
+        total = sum(self.folhas.values()) or 1
+        return {
+            "modo": "amostragem",
+            "intervalo_seg": self.intervalo,
+            "amostras": sum(self.folhas.values()),
+            "arquivo": str(destino),
+            "top": [
+                {"funcao": f, "amostras": n, "fracao": round(n / total, 4)}
+                for f, n in self.folhas.most_common(TOP_FUNCOES)
+            ],
+        }
+
+
+class _CProfile:
+    def __init__(self):
+        self.prof = cProfile.Profile()
+
+    def iniciar(self):
+        self.prof.enable()
+
+    def parar(self, destino: Path) -> dict:
+        self.prof.disable()
+        destino = destino.with_suffix(".prof")
+        self.prof.dump_stats(destino)
+        stats = pstats.Stats(self.prof, stream=io.StringIO())
+        top = []
+        for (arq, linha, func), (cc, nc, tt, ct, _) in sorted(
+            stats.stats.items(), key=lambda kv: -kv[1][3]
+        )[:TOP_FUNCOES]:
+            top.append(
+                {
+                    "funcao": f"{func} ({Path(arq).name}:{linha})",
+                    "chamadas": nc,
+                    "tempo_proprio": round(tt, 6),
+                    "tempo_acumulado": round(ct, 6),
+                }
+            )
+        return {"modo": "cprofile", "arquivo": str(destino), "top": top}
+
+
+def _criar_perfilador():
+    modo = os.getenv("ETL_PERFIL", "").strip().lower()
+    if modo == "cprofile":
+        return _CProfile()
+    if modo == "amostragem":
+        return _Amostrador()
+    return None
+
+
+@contextmanager
+def execucao(script: str):
+    """Liga a instrumentação durante o bloco e grava o relatório JSON no fim."""
+    global _relatorio
+    if os.getenv("ETL_PERF", "1") == "0":
+        yield None
+        return
+
+    _relatorio = rel = Relatorio(script)
+    perfilador = _criar_perfilador()
+    if perfilador:
+        perfilador.iniciar()
+
+    status = "ok"
+    try:
+        yield rel
+    except BaseException:
+        status = "erro"
+        raise
+    finally:
+        _relatorio = None
+        PERF_DIR.mkdir(parents=True, exist_ok=True)
+        base = PERF_DIR / f"{script}_{time.strftime('%Y%m%d-%H%M%S')}_{rel.execucao}"
+        dados = rel.como_dict(status)
+        if perfilador:
+            dados["perfil"] = perfilador.parar(base)
+        base.with_suffix(".json").write_text(json.dumps(dados, indent=2, ensure_ascii=False), encoding="utf-8")
+        print("Relatório de desempenho:", base.with_suffix(".json"))
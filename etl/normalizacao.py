@@ -0,0 +1,60 @@
+#normalizacao.py
+
+import re
+from functools import lru_cache
+
+import ftfy
+import pandas as pd
+
+from instrumentacao import medir
+
+# NÃO remover \x80-\x9f (C1). Removemos só C0 e DEL para não “comer” caracteres
+# quando o arquivo é lido como latin1. (Esse foi o bug principal.)
+CTRL = re.compile(r"[\x00-\x1f\x7f]")
+
+# Razao_Social/UF/Modalidade têm poucos milhares de valores distintos; o cache
+# cobre todos com folga e continua limitado se vier algo inesperado.
+CACHE_TEXTO_MAX = 65536
+
+
+@lru_cache(maxsize=CACHE_TEXTO_MAX)
+def _limpar_texto_memo(s: str) -> str:
+    s = s.replace('"', "").strip()
+    s = CTRL.sub("", s)
+    s = ftfy.fix_text(s)  # corrige mojibake/glitches quando há informação [page:1]
+    return s.strip()
+
+
+def limpar_texto(x) -> str:
+    return _limpar_texto_memo("" if x is None else str(x))
+
+
+def aplicar_por_valor_unico(series: pd.Series, func) -> pd.Series:
+    """
+    Equivalente a series.apply(func), mas chama func uma vez por valor distinto:
+    - factoriza a coluna (NaN vira um valor próprio, como no apply)
+    - aplica func só nos únicos
+    - devolve o resultado expandido pelos códigos, com o mesmo índice
+    """
+    if series.empty:
+        return series.astype(object)
+    codigos, unicos = pd.factorize(series, use_na_sentinel=False)
+    resultado = pd.Series([func(v) for v in unicos], dtype=object)
+    return pd.Series(resultado.to_numpy()[codigos], index=series.index, name=series.name)
+
+
+@medir()
+def limpar_coluna(series: pd.Series) -> pd.Series:
+    return aplicar_por_valor_unico(series, limpar_texto)
+
+
+def info_cache_texto() -> dict:
+    return _limpar_texto_memo.cache_info()._asdict()
+
+
+def assert_no_replacement_char(series: pd.Series, label: str):
+    unicos = pd.Series(pd.unique(series.fillna("").astype(object)), dtype=object).astype(str)
+    ruins = unicos[unicos.str.contains("\uFFFD", regex=False)]  # "�"
+    if not ruins.empty:
+        ex = ruins.head(10).tolist()
+        raise ValueError(f"{label} contém '�' (U+FFFD). Exemplos: " + " | ".join(ex))
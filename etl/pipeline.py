@@ -0,0 +1,411 @@
+#pipeline.py
+
+"""
+Orquestrador do ETL: roda os scripts de etl/ como um DAG.
+
+- cada etapa é um script (subprocesso) com entradas/saídas conhecidas
+- etapa é pulada quando a impressão digital (código + conteúdo das entradas)
+  é igual à da última execução bem-sucedida e as saídas ainda existem; os
+  downloads rodam sempre (já pulam ZIP igual ao do servidor) e o import só é
+  pulado se a carga do marcador estiver no banco (carga_postgres.carga_confere)
+- etapas independentes rodam em paralelo (ex.: download da ANS e do CADOP)
+- mede tempo, linhas de entrada/saída e pico de RSS de cada etapa; o detalhe
+  por função/arquivo fica nos relatórios de data/output/perf/ (instrumentacao.py)
+
+Uso:
+    python etl/pipeline.py                  # tudo, inclusive import_postgres
+    python etl/pipeline.py --ate agregar_e_zipar
+    python etl/pipeline.py --forcar download_ans --forcar baixar_cadop
+    python etl/pipeline.py --backfill 2019T1 2025T2   # intervalo de trimestres (backfill.py)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Callable
+
+ETL_DIR = Path(__file__).resolve().parent
+RAW_DIR = Path("data/raw")
+OUTPUT_DIR = Path("data/output")
+CACHE_PATH = Path("data/.pipeline_cache.json")
+METRICAS_PATH = OUTPUT_DIR / "pipeline_metricas.json"
+
+
+@dataclass
+class Etapa:
+    nome: str
+    script: str
+    depende: list[str] = field(default_factory=list)
+    entradas: list[Path] = field(default_factory=list)
+    saidas: list[Path] = field(default_factory=list)
+    # módulos compartilhados que entram na impressão digital do código
+    modulos: list[str] = field(default_factory=list)
+    args: list[str] = field(default_factory=list)
+    # fonte externa (site da ANS): o cache não enxerga mudança remota, roda sempre
+    sempre: bool = False
+    # checagem extra de "em dia" além dos arquivos (ex.: a carga está no banco?)
+    conferir: Callable[[], bool] | None = None
+
+
+CADOP_CSVS = [
+    RAW_DIR / "cadop" / "Relatorio_cadop.csv",
+    RAW_DIR / "cadop" / "Relatorio_cadop_canceladas.csv",
+]
+
+def _carga_no_banco() -> bool:
+    # import tardio: só quem roda import_postgres precisa de sqlalchemy/pandas
+    from carga_postgres import carga_confere
+
+    return carga_confere()
+
+
+ETAPAS = [
+    Etapa(
+        "download_ans",
+        "download_ans.py",
+        saidas=[RAW_DIR / "*.zip"],
+        sempre=True,
+    ),
+    Etapa(
+        "baixar_cadop",
+        "cadop.py",
+        saidas=CADOP_CSVS,
+        sempre=True,
+    ),
+    Etapa(
+        "process_files",
+        "process_files.py",
+        depende=["download_ans"],
+        entradas=[RAW_DIR / "*.zip"],
+        saidas=[OUTPUT_DIR / "consolidado_despesas.csv", OUTPUT_DIR / "consolidado_despesas.zip"],
+        modulos=["schema.py", "saida.py", "cache_excel.py"],
+    ),
+    Etapa(
+        "enrich_cadop",
+        "enrich_cadop.py",
+        depende=["process_files", "baixar_cadop"],
+        entradas=[OUTPUT_DIR / "consolidado_despesas.csv", *CADOP_CSVS],
+        saidas=[
+            OUTPUT_DIR / "consolidado_despesas_enriquecido.csv",
+            OUTPUT_DIR / "consolidado_despesas_enriquecido.zip",
+        ],
+        modulos=["cadop.py", "normalizacao.py", "schema.py", "saida.py"],
+    ),
+    Etapa(
+        "enrich_uf_modalidade",
+        "enrich_uf_modalidade_por_cnpj.py",
+        depende=["enrich_cadop", "baixar_cadop"],
+        entradas=[OUTPUT_DIR / "consolidado_despesas_enriquecido.csv", *CADOP_CSVS],
+        saidas=[OUTPUT_DIR / "consolidado_despesas_validado_enriquecido.csv"],
+        modulos=["cadop.py", "normalizacao.py", "schema.py", "saida.py"],
+    ),
+    Etapa(
+        "agregar_e_zipar",
+        "agregar_e_zipar.py",
+        depende=["enrich_uf_modalidade"],
+        entradas=[OUTPUT_DIR / "consolidado_despesas_validado_enriquecido.csv"],
+        saidas=[OUTPUT_DIR / "despesas_agregadas.csv", OUTPUT_DIR / "Teste_LucasAssuncaoBraga.zip"],
+        modulos=["normalizacao.py", "schema.py", "saida.py"],
+    ),
+    Etapa(
+        "exportar_parquet",
+        "exportar_parquet.py",
+        depende=["enrich_cadop", "enrich_uf_modalidade", "agregar_e_zipar"],
+        entradas=[
+            OUTPUT_DIR / "consolidado_despesas_validado_enriquecido.csv",
+            OUTPUT_DIR / "consolidado_despesas_enriquecido.csv",
+            OUTPUT_DIR / "despesas_agregadas.csv",
+        ],
+        saidas=[OUTPUT_DIR / "parquet" / "*.parquet"],
+        modulos=["tabelas.py", "schema.py"],
+    ),
+    Etapa(
+        "import_postgres",
+        "import_postgres.py",
+        depende=["enrich_cadop", "enrich_uf_modalidade", "agregar_e_zipar"],
+        entradas=[
+            OUTPUT_DIR / "consolidado_despesas_validado_enriquecido.csv",
+            OUTPUT_DIR / "consolidado_despesas_enriquecido.csv",
+            OUTPUT_DIR / "despesas_agregadas.csv",
+        ],
+        saidas=[OUTPUT_DIR / "import_postgres.json"],
+        modulos=["carga_postgres.py", "tabelas.py", "schema.py"],
+        conferir=_carga_no_banco,
+    ),
+]
+
+
+def etapas_backfill(etapas: list[Etapa], inicio: str, fim: str) -> list[Etapa]:
+    """
+    Troca download_ans + process_files por uma etapa única (backfill.py) que
+    baixa o intervalo pedido e processa cada trimestre enquanto baixa o próximo.
+    """
+    por_nome = {e.nome: e for e in etapas}
+    backfill = Etapa(
+        "backfill",
+        "backfill.py",
+        saidas=por_nome["process_files"].saidas,
+        modulos=["download_ans.py", "process_files.py", "schema.py", "saida.py", "cache_excel.py"],
+        args=["--de", inicio, "--ate", fim],
+    )
+    trocar = {"download_ans": "backfill", "process_files": "backfill"}
+    novas = [backfill]
+    for e in etapas:
+        if e.nome in trocar:
+            continue
+        depende = list(dict.fromkeys(trocar.get(d, d) for d in e.depende))
+        novas.append(replace(e, depende=depende))
+    return novas
+
+
+def _arquivos(path: Path) -> list[Path]:
+    if "*" in path.name:
+        return sorted(p for p in path.parent.glob(path.name) if p.is_file())
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file())
+    return [path] if path.exists() else []
+
+
+def _hash_arquivo(path: Path, h) -> None:
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloco)
+
+
+def impressao_digital(etapa: Etapa) -> str:
+    h = hashlib.sha256()
+    for mod in [etapa.script, *etapa.modulos]:
+        h.update(mod.encode())
+        _hash_arquivo(ETL_DIR / mod, h)
+    h.update(json.dumps(etapa.args).encode())
+    for entrada in etapa.entradas:
+        for arq in _arquivos(entrada):
+            h.update(str(arq).encode())
+            _hash_arquivo(arq, h)
+    return h.hexdigest()
+
+
+def saidas_existem(etapa: Etapa) -> bool:
+    return all(_arquivos(s) for s in etapa.saidas)
+
+
+def contar_linhas(paths: list[Path]) -> int | None:
+    """Linhas de dados (sem cabeçalho) dos CSVs; None se não houver CSV."""
+    total = None
+    for p in paths:
+        for arq in _arquivos(p):
+            if arq.suffix.lower() != ".csv":
+                continue
+            with open(arq, "rb") as f:
+                n = sum(bloco.count(b"\n") for bloco in iter(lambda: f.read(1024 * 1024), b""))
+            total = (total or 0) + max(n - 1, 0)
+    return total
+
+
+def carregar_cache() -> dict:
+    if CACHE_PATH.exists():
+        return json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+    return {}
+
+
+def salvar_cache(cache: dict):
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    CACHE_PATH.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+
+
+_print_lock = threading.Lock()
+
+
+def _log(nome: str, linha: str):
+    with _print_lock:
+        print(f"[{nome}] {linha}", flush=True)
+
+
+def executar_etapa(etapa: Etapa) -> dict:
+    """Roda o script num subprocesso, repassando a saída com prefixo."""
+    cmd = [sys.executable, "-u", str(ETL_DIR / etapa.script), *etapa.args]
+    linhas_entrada = contar_linhas(etapa.entradas)
+
+    inicio = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+
+    def repassar():
+        for linha in proc.stdout:
+            _log(etapa.nome, linha.rstrip("\n"))
+
+    leitor = threading.Thread(target=repassar, daemon=True)
+    leitor.start()
+
+    pico_rss_mb = None
+    if hasattr(os, "wait4"):
+        # wait4 devolve o rusage só deste filho (ru_maxrss em KB no Linux)
+        _, status, uso = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        pico_rss_mb = uso.ru_maxrss / 1024
+    else:
+        proc.wait()
+    leitor.join()
+
+    return {
+        "etapa": etapa.nome,
+        "status": "ok" if proc.returncode == 0 else "erro",
+        "codigo_saida": proc.returncode,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "linhas_entrada": linhas_entrada,
+        "linhas_saida": contar_linhas(etapa.saidas),
+        "pico_rss_mb": round(pico_rss_mb, 1) if pico_rss_mb is not None else None,
+    }
+
+
+def selecionar(etapas: list[Etapa], ate: str | None) -> list[Etapa]:
+    if not ate:
+        return etapas
+    por_nome = {e.nome: e for e in etapas}
+    if ate not in por_nome:
+        raise SystemExit(f"Etapa desconhecida: {ate}. Opções: {', '.join(por_nome)}")
+    necessarias: set[str] = set()
+    pilha = [ate]
+    while pilha:
+        nome = pilha.pop()
+        if nome not in necessarias:
+            necessarias.add(nome)
+            pilha.extend(por_nome[nome].depende)
+    return [e for e in etapas if e.nome in necessarias]
+
+
+def rodar(etapas: list[Etapa], forcar: set[str], jobs: int) -> list[dict]:
+    cache = carregar_cache()
+    pendentes = {e.nome: e for e in etapas}
+    concluidas: set[str] = set()
+    digitais: dict[str, str] = {}
+    falhou = False
+    metricas = []
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        em_execucao = {}
+        while pendentes or em_execucao:
+            # repete porque etapas puladas liberam as dependentes na hora
+            prontas = True
+            while prontas:
+                prontas = [
+                    e for e in pendentes.values()
+                    if not falhou and all(d in concluidas for d in e.depende)
+                ]
+                for etapa in prontas:
+                    del pendentes[etapa.nome]
+                    digital = digitais[etapa.nome] = impressao_digital(etapa)
+                    if (
+                        etapa.nome not in forcar
+                        and not etapa.sempre
+                        and cache.get(etapa.nome) == digital
+                        and saidas_existem(etapa)
+                        and (etapa.conferir is None or etapa.conferir())
+                    ):
+                        _log(etapa.nome, "sem mudanças nas entradas; pulando")
+                        metricas.append({"etapa": etapa.nome, "status": "pulada"})
+                        concluidas.add(etapa.nome)
+                        continue
+                    _log(etapa.nome, "iniciando")
+                    em_execucao[pool.submit(executar_etapa, etapa)] = etapa
+
+            if not em_execucao:
+                # nada rodando e nada pronto: só sobra o que depende de etapa que falhou
+                for nome in pendentes:
+                    metricas.append({"etapa": nome, "status": "nao_executada"})
+                break
+
+            feitas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for fut in feitas:
+                etapa = em_execucao.pop(fut)
+                m = fut.result()
+                metricas.append(m)
+                if m["status"] == "ok":
+                    cache[etapa.nome] = digitais[etapa.nome]
+                    salvar_cache(cache)
+                    concluidas.add(etapa.nome)
+                    _log(etapa.nome, f"OK em {m['segundos']:.1f}s")
+                else:
+                    falhou = True
+                    _log(etapa.nome, f"FALHOU (código {m['codigo_saida']})")
+
+    return metricas
+
+
+def imprimir_resumo(metricas: list[dict]):
+    print("\n" + "=" * 78)
+    print(f"{'etapa':<22}{'status':<14}{'tempo(s)':>10}{'linhas in':>11}{'linhas out':>11}{'RSS(MB)':>10}")
+    print("-" * 78)
+    for m in metricas:
+        def fmt(chave):
+            v = m.get(chave)
+            return "-" if v is None else str(v)
+        print(
+            f"{m['etapa']:<22}{m['status']:<14}{fmt('segundos'):>10}"
+            f"{fmt('linhas_entrada'):>11}{fmt('linhas_saida'):>11}{fmt('pico_rss_mb'):>10}"
+        )
+    print("=" * 78)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Roda o ETL completo como um DAG com cache por etapa.")
+    ap.add_argument("--ate", metavar="ETAPA", help="roda só esta etapa e suas dependências")
+    ap.add_argument("--forcar", metavar="ETAPA", action="append", default=[], help="ignora o cache desta etapa")
+    ap.add_argument("--forcar-tudo", action="store_true", help="ignora o cache de todas as etapas")
+    ap.add_argument("--jobs", type=int, default=2, help="etapas em paralelo (padrão: 2)")
+    ap.add_argument("--listar", action="store_true", help="lista as etapas e sai")
+    ap.add_argument(
+        "--backfill",
+        nargs=2,
+        metavar=("DE", "ATE"),
+        help="baixa/processa o intervalo de trimestres DE..ATE (AAAATn) em vez dos 3 mais recentes",
+    )
+    args = ap.parse_args(argv)
+
+    etapas = etapas_backfill(ETAPAS, *args.backfill) if args.backfill else ETAPAS
+    if args.backfill and args.ate in ("download_ans", "process_files"):
+        args.ate = "backfill"
+    etapas = selecionar(etapas, args.ate)
+    if args.listar:
+        for e in etapas:
+            print(f"{e.nome:<22} <- {', '.join(e.depende) or '-'}")
+        return 0
+
+    forcar = {e.nome for e in etapas} if args.forcar_tudo else set(args.forcar)
+    # relatórios de desempenho (instrumentacao.py) de todas as etapas com o mesmo id
+    os.environ.setdefault("ETL_EXECUCAO_ID", uuid.uuid4().hex[:12])
+    iniciado_em = time.strftime("%Y-%m-%dT%H:%M:%S")
+    inicio = time.perf_counter()
+    metricas = rodar(etapas, forcar, max(1, args.jobs))
+    total = time.perf_counter() - inicio
+
+    imprimir_resumo(metricas)
+    print(f"Tempo total: {total:.1f}s")
+
+    METRICAS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    METRICAS_PATH.write_text(
+        json.dumps({"execucao": os.environ["ETL_EXECUCAO_ID"], "inicio": iniciado_em, "segundos": round(total, 3), "etapas": metricas}, indent=2),
+        encoding="utf-8",
+    )
+    print("Métricas:", METRICAS_PATH)
+
+    return 1 if any(m["status"] in ("erro", "nao_executada") for m in metricas) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
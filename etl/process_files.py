@@ -8,6 +8,10 @@ from typing import Any
 
 import pandas as pd
 
+from cache_excel import ler_excel
+from instrumentacao import contar, execucao, medir, span
+from schema import escrever_csv
+
 RAW_DIR = Path("data/raw")
 EXTRACTED_DIR = Path("data/extracted")
 OUTPUT_DIR = Path("data/output")
@@ -24,24 +28,33 @@ def extrair_ano_tri_do_zip(zip_path: Path):
     return None, None
 
 
+def extrair_zip(zip_path: Path, extracted_dir: Path = EXTRACTED_DIR) -> list[Path]:
+    ano, tri = extrair_ano_tri_do_zip(zip_path)
+    subdir = extracted_dir / (f"{ano}_T{tri}" if ano and tri else zip_path.stem)
+    subdir.mkdir(parents=True, exist_ok=True)
+    extraidos = []
+
+    with span("extrair_zip", arquivo=zip_path) as sp, zipfile.ZipFile(zip_path, "r") as z:
+        sp.extra["membros"] = len(z.namelist())
+        for member in z.namelist():
+            if member.endswith("/"):
+                continue
+            dest_path = subdir / member
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            with z.open(member) as src, open(dest_path, "wb") as dst:
+                dst.write(src.read())
+            extraidos.append(dest_path)
+
+    return extraidos
+
+
+@medir()
 def extrair_todos_zips(raw_dir: Path = RAW_DIR, extracted_dir: Path = EXTRACTED_DIR):
     extracted_dir.mkdir(parents=True, exist_ok=True)
     extraidos = []
 
     for zip_path in raw_dir.glob("*.zip"):
-        ano, tri = extrair_ano_tri_do_zip(zip_path)
-        subdir = extracted_dir / (f"{ano}_T{tri}" if ano and tri else zip_path.stem)
-        subdir.mkdir(parents=True, exist_ok=True)
-
-        with zipfile.ZipFile(zip_path, "r") as z:
-            for member in z.namelist():
-                if member.endswith("/"):
-                    continue
-                dest_path = subdir / member
-                dest_path.parent.mkdir(parents=True, exist_ok=True)
-                with z.open(member) as src, open(dest_path, "wb") as dst:
-                    dst.write(src.read())
-                extraidos.append(dest_path)
+        extraidos.extend(extrair_zip(zip_path, extracted_dir))
 
     return extraidos
 
@@ -60,24 +73,34 @@ def ler_dataframe(path: Path):
     if not formato:
         return None
 
-    try:
-        if formato == "excel":
-            # lê tudo como string para evitar REG_ANS virar float
-            return pd.read_excel(path, dtype=str)
-
-        # CSV/TXT: tenta encodings e detecta separador
-        for enc in ("utf-8-sig", "utf-8", "latin1"):
-            try:
-                with open(path, "r", encoding=enc) as f:
-                    primeira = f.readline()
-                sep = ";" if primeira.count(";") > primeira.count(",") else ","
-                return pd.read_csv(path, sep=sep, encoding=enc, dtype=str)
-            except Exception:
-                continue
+    with span("ler_dataframe", arquivo=path) as sp:
+        sp.extra["formato"] = formato
+        try:
+            if formato == "excel":
+                # lê tudo como string para evitar REG_ANS virar float;
+                # convertida uma vez e depois lida do cache (cache_excel.py)
+                df = ler_excel(path, sp.extra)
+                sp.linhas = len(df)
+                return df
+
+            # CSV/TXT: tenta encodings e detecta separador
+            for tentativa, enc in enumerate(("utf-8-sig", "utf-8", "latin1"), start=1):
+                try:
+                    with open(path, "r", encoding=enc) as f:
+                        primeira = f.readline()
+                    sep = ";" if primeira.count(";") > primeira.count(",") else ","
+                    df = pd.read_csv(path, sep=sep, encoding=enc, dtype=str)
+                    sp.linhas = len(df)
+                    sp.extra["encoding"] = enc
+                    sp.extra["tentativas"] = tentativa
+                    return df
+                except Exception:
+                    contar("ler_dataframe.encoding_falhou")
+                    continue
 
-        return None
-    except Exception:
-        return None
+            return None
+        except Exception:
+            return None
 
 
 def inferir_ano_tri_pelo_caminho(path: Path):
@@ -88,6 +111,7 @@ def inferir_ano_tri_pelo_caminho(path: Path):
     return None, None
 
 
+@medir()
 def filtrar_eventos_sinistros(df: pd.DataFrame):
     if "DESCRICAO" not in df.columns:
         return df.iloc[0:0]
@@ -159,11 +183,15 @@ def processar_arquivo(path: Path):
 
     # Converte valor
     df2 = df2.copy()
-    df2["VALOR"] = df2["VL_SALDO_FINAL"].apply(to_float_br)
+    with span("to_float_br") as sp:
+        df2["VALOR"] = df2["VL_SALDO_FINAL"].apply(to_float_br)
+        sp.linhas = len(df2)
     df2 = df2.dropna(subset=["VALOR"])
 
     # Normaliza REG_ANS antes de agrupar (evita 477.0 e NaN)
-    df2["REG_ANS_NORM"] = df2["REG_ANS"].apply(normalizar_reg_ans)
+    with span("normalizar_reg_ans") as sp:
+        df2["REG_ANS_NORM"] = df2["REG_ANS"].apply(normalizar_reg_ans)
+        sp.linhas = len(df2)
     df2 = df2[df2["REG_ANS_NORM"] != ""]
 
     if df2.empty:
@@ -193,20 +221,31 @@ def processar_arquivo(path: Path):
     return registros
 
 
-def consolidar_dados(extracted_dir: Path = EXTRACTED_DIR, output_dir: Path = OUTPUT_DIR):
-    output_dir.mkdir(parents=True, exist_ok=True)
+def processar_arquivos(paths) -> list[dict]:
     todos = []
-
-    for path in extracted_dir.rglob("*"):
+    for path in paths:
         if path.is_file():
-            regs = processar_arquivo(path)
+            with span("processar_arquivo", arquivo=path) as sp:
+                regs = processar_arquivo(path)
+                sp.linhas = len(regs)
             if regs:
                 print(f"{path} -> {len(regs)} regs (REG_ANS)")
                 todos.extend(regs)
+    return todos
+
+
+def processar_zip(zip_path: Path, extracted_dir: Path = EXTRACTED_DIR) -> list[dict]:
+    """Extrai e processa um único ZIP (um trimestre); usado pelo backfill."""
+    return processar_arquivos(extrair_zip(zip_path, extracted_dir))
 
+
+def salvar_consolidado(todos: list[dict], output_dir: Path = OUTPUT_DIR) -> Path:
+    """Grava consolidado_despesas.csv e o .zip correspondente (uma passada só)."""
     if not todos:
         raise RuntimeError("Nenhum registro consolidado. Verifique filtros/arquivos extraídos.")
 
+    output_dir.mkdir(parents=True, exist_ok=True)
+
     # Consolida duplicidades entre arquivos (mesmo RegistroANS/Ano/Trimestre)
     df_all = pd.DataFrame(todos)
     df_all["RegistroANS"] = df_all["RegistroANS"].apply(normalizar_reg_ans)
@@ -222,17 +261,15 @@ def consolidar_dados(extracted_dir: Path = EXTRACTED_DIR, output_dir: Path = OUT
     df_final.insert(0, "CNPJ", "")
 
     out_csv = output_dir / "consolidado_despesas.csv"
-    df_final = df_final[["CNPJ", "RazaoSocial", "RegistroANS", "Trimestre", "Ano", "ValorDespesas"]]
-    df_final.to_csv(out_csv, index=False, encoding="utf-8")
-
+    with span("escrever_csv_zip", arquivo=out_csv) as sp:
+        escrever_csv(df_final, out_csv, "consolidado", encoding="utf-8", zip_path=out_csv.with_suffix(".zip"))
+        sp.linhas = len(df_final)
     return out_csv
 
 
-def compactar_saida(csv_path: Path):
-    zip_path = csv_path.with_suffix(".zip")
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-        z.write(csv_path, arcname=csv_path.name)
-    return zip_path
+@medir()
+def consolidar_dados(extracted_dir: Path = EXTRACTED_DIR, output_dir: Path = OUTPUT_DIR):
+    return salvar_consolidado(processar_arquivos(extracted_dir.rglob("*")), output_dir)
 
 
 def pipeline_parte1():
@@ -240,14 +277,12 @@ def pipeline_parte1():
     extraidos = extrair_todos_zips()
     print(f"Arquivos extraidos: {len(extraidos)}")
 
-    print("Consolidando dados...")
+    print("Consolidando e compactando...")
     csv_path = consolidar_dados()
 
-    print("Compactando...")
-    zip_path = compactar_saida(csv_path)
-
-    print("Pronto:", zip_path)
+    print("Pronto:", csv_path.with_suffix(".zip"))
 
 
 if __name__ == "__main__":
-    pipeline_parte1()
+    with execucao("process_files"):
+        pipeline_parte1()
@@ -0,0 +1,139 @@
+#saida.py
+
+"""
+Gravação dos CSVs de saída junto com o ZIP de entrega, numa passada só.
+
+Antes cada etapa gravava o CSV inteiro e depois o relia do disco para
+compactar (ZipFile.write). Aqui o DataFrame é formatado em blocos e cada
+bloco vai, já codificado, para o CSV e para a entrada do ZIP: o CSV sai
+byte a byte igual ao df.to_csv e não há segunda leitura.
+
+Compressão configurável:
+    ETL_ZIP_METODO   deflated (padrão) | stored | bzip2 | lzma
+    ETL_ZIP_NIVEL    nível (deflated 0-9, bzip2 1-9; padrão: o do zlib, 6)
+
+Saídas grandes (>= LINHAS_PARALELO linhas) compactam numa thread à parte
+enquanto a principal formata o próximo bloco; o zlib/bz2/lzma soltam o GIL
+durante a compressão. ETL_ZIP_PARALELO=1/0 força liga/desliga.
+"""
+
+import os
+import queue
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+METODOS = {
+    "deflated": zipfile.ZIP_DEFLATED,
+    "stored": zipfile.ZIP_STORED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+METODO = os.getenv("ETL_ZIP_METODO", "deflated")
+NIVEL = int(os.getenv("ETL_ZIP_NIVEL")) if os.getenv("ETL_ZIP_NIVEL") else None
+PARALELO = os.getenv("ETL_ZIP_PARALELO")  # None = automático
+
+LINHAS_POR_BLOCO = 50_000
+LINHAS_PARALELO = 200_000
+# acima disso a entrada pode passar de 4 GiB: já abre em ZIP64
+LINHAS_ZIP64 = 10_000_000
+
+
+def _blocos_csv(df: pd.DataFrame, encoding: str, linhas_por_bloco: int):
+    """df.to_csv em pedaços, já em bytes (BOM só no primeiro, se utf-8-sig)."""
+    enc_resto = "utf-8" if encoding.lower().replace("_", "-") == "utf-8-sig" else encoding
+    for i in range(0, max(len(df), 1), linhas_por_bloco):
+        texto = df.iloc[i:i + linhas_por_bloco].to_csv(index=False, header=(i == 0))
+        yield texto.encode(encoding if i == 0 else enc_resto)
+
+
+class _EscritorEmThread:
+    """write() enfileira; uma thread grava no destino (fila limitada)."""
+
+    _FIM = object()
+
+    def __init__(self, destino, tamanho_fila: int = 4):
+        self._destino = destino
+        self._fila: queue.Queue = queue.Queue(maxsize=tamanho_fila)
+        self._erro = None
+        self._thread = threading.Thread(target=self._rodar, name="zip", daemon=True)
+        self._thread.start()
+
+    def _rodar(self):
+        while True:
+            bloco = self._fila.get()
+            if bloco is self._FIM:
+                return
+            if self._erro is None:
+                try:
+                    self._destino(bloco)
+                except BaseException as e:
+                    self._erro = e
+
+    def write(self, bloco: bytes):
+        if self._erro is not None:
+            raise self._erro
+        self._fila.put(bloco)
+
+    def fechar(self):
+        self._fila.put(self._FIM)
+        self._thread.join()
+        if self._erro is not None:
+            raise self._erro
+
+
+def escrever_csv_zip(
+    df: pd.DataFrame,
+    csv_path: Path,
+    zip_path: Path | None = None,
+    encoding: str = "utf-8-sig",
+    metodo: str | None = None,
+    nivel: int | None = None,
+    paralelo: bool | None = None,
+    linhas_por_bloco: int = LINHAS_POR_BLOCO,
+) -> dict:
+    """
+    Grava `df` em `csv_path` e, com `zip_path`, o mesmo conteúdo como
+    entrada `csv_path.name` do ZIP. Retorna bytes do CSV/ZIP e o modo usado.
+    """
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    if zip_path is None:
+        df.to_csv(csv_path, index=False, encoding=encoding)
+        return {"bytes_csv": csv_path.stat().st_size}
+
+    metodo = metodo or METODO
+    if metodo not in METODOS:
+        raise ValueError(f"ETL_ZIP_METODO inválido: {metodo}. Use: {', '.join(METODOS)}")
+    nivel = NIVEL if nivel is None else nivel
+    if paralelo is None:
+        paralelo = PARALELO == "1" if PARALELO in ("0", "1") else len(df) >= LINHAS_PARALELO
+
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    info = zipfile.ZipInfo(csv_path.name, date_time=time.localtime()[:6])
+    info.compress_type = METODOS[metodo]
+    info.external_attr = 0o644 << 16
+    # ZipInfo montado à mão não herda o compresslevel do ZipFile (só entradas
+    # abertas pelo nome herdam); o atributo virou público no Python 3.13
+    setattr(info, "compress_level" if hasattr(info, "compress_level") else "_compresslevel", nivel)
+
+    with open(csv_path, "wb") as arq, zipfile.ZipFile(zip_path, "w", METODOS[metodo], compresslevel=nivel) as zf:
+        with zf.open(info, "w", force_zip64=len(df) >= LINHAS_ZIP64) as entrada:
+            escritor = _EscritorEmThread(entrada.write) if paralelo else None
+            try:
+                for bloco in _blocos_csv(df, encoding, linhas_por_bloco):
+                    arq.write(bloco)
+                    (escritor or entrada).write(bloco)
+            finally:
+                if escritor:
+                    escritor.fechar()
+
+    return {
+        "bytes_csv": csv_path.stat().st_size,
+        "bytes_zip": zip_path.stat().st_size,
+        "metodo": metodo,
+        "nivel": nivel,
+        "paralelo": paralelo,
+    }
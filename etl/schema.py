@@ -0,0 +1,143 @@
+#schema.py
+
+"""
+Tipos das colunas de cada CSV do ETL, usados na leitura e na escrita.
+
+Antes tudo era lido com dtype=str: Ano/Trimestre/valores viravam objetos
+Python (~50-60 bytes por célula) e UF/Modalidade/CNPJ repetiam a mesma
+string milhares de vezes. Aqui:
+
+- Ano/Trimestre: Int16 (2 bytes; nullable, linha ruim não derruba a leitura)
+- valores: float64 (é o que o process_files grava; o import arredonda p/ NUMERIC(18,2))
+- UF/Modalidade e chaves que se repetem por trimestre (CNPJ, RazaoSocial,
+  RegistroANS): category (códigos int16 + um valor por operadora)
+- colunas que ainda vão ser preenchidas/normalizadas como texto: str
+
+Uso:
+    df = ler_csv(caminho, "enriquecido")
+    df = tipar(df, "enriquecido")            # ordem das colunas + dtypes
+    escrever_csv(df, caminho, "enriquecido")
+"""
+
+from collections import defaultdict
+from pathlib import Path
+
+import pandas as pd
+
+from saida import escrever_csv_zip
+
+PERIODO = "Int16"
+VALOR = "float64"
+CONTAGEM = "Int32"
+CATEGORIA = "category"
+TEXTO = str
+
+# consolidado_despesas.csv (process_files / backfill). CNPJ/RazaoSocial ainda
+# vazios: ficam texto para o enrich_cadop preencher com fillna/mask.
+CONSOLIDADO = {
+    "CNPJ": TEXTO,
+    "RazaoSocial": TEXTO,
+    "RegistroANS": TEXTO,
+    "Trimestre": PERIODO,
+    "Ano": PERIODO,
+    "ValorDespesas": VALOR,
+}
+
+# consolidado_despesas_enriquecido.csv (enrich_cadop)
+ENRIQUECIDO = {
+    "CNPJ": CATEGORIA,
+    "RazaoSocial": CATEGORIA,
+    "RegistroANS": CATEGORIA,
+    "Trimestre": PERIODO,
+    "Ano": PERIODO,
+    "ValorDespesas": VALOR,
+}
+
+# consolidado_despesas_validado_enriquecido.csv (enrich_uf_modalidade_por_cnpj)
+VALIDADO = {
+    **ENRIQUECIDO,
+    "UF": CATEGORIA,
+    "Modalidade": CATEGORIA,
+}
+
+# despesas_agregadas.csv (agregar_e_zipar): uma linha por (RazaoSocial, UF)
+AGREGADO = {
+    "RazaoSocial": TEXTO,
+    "UF": CATEGORIA,
+    "total_despesas": VALOR,
+    "media_trimestral": VALOR,
+    "desvio_padrao": VALOR,
+    "n_linhas": CONTAGEM,
+    "n_validos": CONTAGEM,
+}
+
+# Relatório CADOP (ativas/canceladas). As chaves passam por limpeza/normalização
+# de texto; só UF/Modalidade viram categoria. Demais colunas do relatório: str.
+CADOP = {
+    "REGISTRO_OPERADORA": TEXTO,
+    "CNPJ": TEXTO,
+    "Razao_Social": TEXTO,
+    "UF": CATEGORIA,
+    "Modalidade": CATEGORIA,
+}
+
+DATASETS = {
+    "consolidado": CONSOLIDADO,
+    "enriquecido": ENRIQUECIDO,
+    "validado": VALIDADO,
+    "agregado": AGREGADO,
+    "cadop": CADOP,
+}
+
+
+def colunas(dataset: str) -> list[str]:
+    return list(DATASETS[dataset])
+
+
+def ler_csv(path: Path, dataset: str, usecols=None, **kwargs):
+    """
+    pd.read_csv com os dtypes do dataset. Colunas fora do schema continuam
+    str (como antes). Aceita os mesmos kwargs (chunksize, nrows, ...).
+    """
+    kwargs.setdefault("encoding", "utf-8-sig")
+    kwargs.setdefault("encoding_errors", "strict")
+    # parser exato: um float lido e regravado sai com os mesmos dígitos
+    kwargs.setdefault("float_precision", "round_trip")
+    dtype = defaultdict(lambda: TEXTO, DATASETS[dataset])
+    return pd.read_csv(path, dtype=dtype, usecols=usecols, **kwargs)
+
+
+def tipar(df: pd.DataFrame, dataset: str) -> pd.DataFrame:
+    """Seleciona as colunas do dataset, na ordem do schema, já nos dtypes dele."""
+    tipos = DATASETS[dataset]
+    faltando = [c for c in tipos if c not in df.columns]
+    if faltando:
+        raise ValueError(f"{dataset}: faltam colunas {faltando}. Achei: {list(df.columns)}")
+    out = df[list(tipos)].copy()
+    for col, tipo in tipos.items():
+        if tipo is TEXTO:
+            # str, mas sem transformar NaN em "nan"
+            if out[col].dtype != object:
+                out[col] = out[col].astype(object).where(out[col].notna(), None)
+        elif out[col].dtype != tipo:
+            out[col] = out[col].astype(tipo)
+    return out
+
+
+def escrever_csv(
+    df: pd.DataFrame, path: Path, dataset: str, encoding: str = "utf-8-sig", zip_path: Path | None = None
+) -> Path:
+    """Grava o CSV (e, com `zip_path`, o ZIP de entrega na mesma passada; ver saida.py)."""
+    escrever_csv_zip(tipar(df, dataset), path, zip_path, encoding=encoding)
+    return path
+
+
+def sem_nulos(series: pd.Series, valor: str = "") -> pd.Series:
+    """fillna(valor) que também funciona em category (fillna puro recusa categoria nova)."""
+    if isinstance(series.dtype, pd.CategoricalDtype) and valor not in series.cat.categories:
+        series = series.cat.add_categories([valor])
+    return series.fillna(valor)
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    return round(df.memory_usage(deep=True).sum() / 1024**2, 2)
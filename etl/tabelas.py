@@ -0,0 +1,120 @@
+#tabelas.py
+
+"""
+As tabelas que a API consulta, montadas a partir dos CSVs do ETL.
+
+Compartilhado por import_postgres.py (COPY no PostgreSQL) e
+exportar_parquet.py (Parquet para o modo DuckDB da API): os dois motores
+servem exatamente as mesmas linhas e o mesmo resumo por operadora.
+"""
+
+import re
+
+import pandas as pd
+
+from schema import ler_csv, sem_nulos
+
+PATH_DIM = "data/output/consolidado_despesas_validado_enriquecido.csv"
+PATH_FATO = "data/output/consolidado_despesas_enriquecido.csv"
+PATH_AGG = "data/output/despesas_agregadas.csv"
+
+# Tabelas derivadas da fato (ver DDL_RESUMO em import_postgres.py). O SQL roda
+# igual no Postgres e no DuckDB; {s} é o sufixo de staging (vazio no DuckDB).
+SQL_OPERADORA_TRIMESTRE = """
+SELECT
+  cnpj,
+  ano,
+  trimestre,
+  SUM(valor_despesas)::NUMERIC(18,2) AS valor_despesas
+FROM fato_despesas_consolidadas
+GROUP BY cnpj, ano, trimestre
+"""
+
+# uma linha por operadora da dim; variação = último trimestre da operadora
+# contra o trimestre imediatamente anterior (NULL se ele não existe ou é 0)
+SQL_OPERADORA_RESUMO = """
+WITH totais AS (
+  SELECT cnpj, SUM(valor_despesas) AS total_despesas, COUNT(*) AS n_trimestres
+  FROM operadora_trimestre{s}
+  GROUP BY cnpj
+),
+ultimo AS (
+  SELECT DISTINCT ON (cnpj) cnpj, ano, trimestre, valor_despesas
+  FROM operadora_trimestre{s}
+  ORDER BY cnpj, ano DESC, trimestre DESC
+),
+base AS (
+  SELECT
+    d.cnpj,
+    d.razao_social,
+    d.uf,
+    d.modalidade,
+    COALESCE(t.total_despesas, 0)::NUMERIC(18,2) AS total_despesas,
+    COALESCE(t.n_trimestres, 0)::SMALLINT AS n_trimestres,
+    u.ano AS ultimo_ano,
+    u.trimestre AS ultimo_trimestre,
+    u.valor_despesas AS valor_ultimo_trimestre,
+    a.valor_despesas AS valor_trimestre_anterior
+  FROM dim_operadora d
+  LEFT JOIN totais t ON t.cnpj = d.cnpj
+  LEFT JOIN ultimo u ON u.cnpj = d.cnpj
+  LEFT JOIN operadora_trimestre{s} a
+    ON a.cnpj = u.cnpj
+   AND a.ano * 4 + a.trimestre = u.ano * 4 + u.trimestre - 1
+)
+SELECT
+  base.*,
+  CASE WHEN valor_trimestre_anterior <> 0
+       THEN ((valor_ultimo_trimestre - valor_trimestre_anterior) / ABS(valor_trimestre_anterior))::DOUBLE PRECISION
+  END AS variacao_trimestral,
+  RANK() OVER (ORDER BY total_despesas DESC)::INTEGER AS rank_nacional,
+  RANK() OVER (PARTITION BY uf ORDER BY total_despesas DESC)::INTEGER AS rank_uf
+FROM base
+"""
+
+
+def only_digits(s: str) -> str:
+    return re.sub(r"\D", "", "" if s is None else str(s))
+
+
+def ler_dim(path: str = PATH_DIM) -> pd.DataFrame:
+    df = ler_csv(path, "validado", usecols=["CNPJ", "RazaoSocial", "UF", "Modalidade"])
+    df = (
+        df.drop_duplicates("CNPJ")
+        .rename(columns={"CNPJ": "cnpj", "RazaoSocial": "razao_social", "UF": "uf", "Modalidade": "modalidade"})
+    )
+    df["cnpj"] = df["cnpj"].apply(only_digits)
+    return df[df["cnpj"].str.len() == 14]
+
+
+def ler_fato(path: str = PATH_FATO) -> pd.DataFrame:
+    df = ler_csv(path, "enriquecido", usecols=["CNPJ", "RegistroANS", "Trimestre", "Ano", "ValorDespesas"])
+    df = df.rename(
+        columns={
+            "CNPJ": "cnpj",
+            "RegistroANS": "registro_ans",
+            "Trimestre": "trimestre",
+            "Ano": "ano",
+            "ValorDespesas": "valor_despesas",
+        }
+    )
+    df["cnpj"] = df["cnpj"].apply(only_digits)
+    df = df[df["cnpj"].str.len() == 14]
+    # Trimestre/Ano já chegam Int16 e o valor float64 (schema.py)
+    df = df.dropna(subset=["trimestre", "ano", "valor_despesas"])
+    df["trimestre"] = df["trimestre"].astype("int16")
+    df["ano"] = df["ano"].astype("int16")
+
+    # Garante 2 casas (NUMERIC(18,2))
+    df["valor_despesas"] = df["valor_despesas"].round(2)
+    return df
+
+
+def ler_agregado(path: str = PATH_AGG) -> pd.DataFrame:
+    # O CSV já sai com nomes: RazaoSocial, UF, total_despesas, media_trimestral, ...
+    # (n_linhas/n_validos chegam Int32: sem "3.0" no CSV do COPY quando há NaN)
+    df = ler_csv(path, "agregado")
+    df = df.rename(columns={"RazaoSocial": "razao_social", "UF": "uf"})
+    df["uf"] = sem_nulos(df["uf"]).astype(str).str.strip()
+    # grupo das operadoras sem match no CADOP (razão social vazia): fora, como no fato sem CNPJ
+    return df[df["razao_social"].fillna("").str.strip() != ""]
@@ -15,14 +15,14 @@ beforeEach(() => {
 describe('Dashboard.vue (vazio)', () => {
   it('mostra estados vazios quando não há dados', async () => {
     apiGet.mockImplementation(async (url) => {
-      if (url === '/api/estatisticas') {
+      if (url === '/api/dashboard') {
         return {
           total_despesas: 0,
           media_despesas: 0,
-          top5_operadoras: [],
+          top_operadoras: [],
+          por_uf: [],
         }
       }
-      if (url === '/api/estatisticas/uf') return []
       throw new Error('URL inesperada: ' + url)
     })
 
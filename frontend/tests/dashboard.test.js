@@ -11,16 +11,16 @@ import { apiGet } from '../src/api.js'
 describe('Dashboard.vue', () => {
   it('renderiza dados após carregar', async () => {
     apiGet.mockImplementation(async (url) => {
-      if (url === '/api/estatisticas') {
+      if (url === '/api/dashboard') {
         return {
           total_despesas: 100,
           media_despesas: 10,
-          top5_operadoras: [
+          top_operadoras: [
             { cnpj: '1', razao_social: 'Operadora A', uf: 'PA', modalidade: 'X', total_despesas: 50 },
           ],
+          por_uf: [],
         }
       }
-      if (url === '/api/estatisticas/uf') return []
       throw new Error('URL inesperada: ' + url)
     })
 
@@ -32,5 +32,6 @@ describe('Dashboard.vue', () => {
 
     expect(wrapper.text()).toContain('Ranking de operadoras')
     expect(wrapper.text()).toContain('Operadora A')
+    expect(apiGet).toHaveBeenCalledTimes(1)
   })
 })
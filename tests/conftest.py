@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+# os scripts de etl/ importam os vizinhos direto (from schema import ...);
+# o backend é importado como pacote (backend.app...) a partir da raiz
+for caminho in (RAIZ / "etl", RAIZ):
+    if str(caminho) not in sys.path:
+        sys.path.insert(0, str(caminho))
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregar_e_zipar import CHAVES, agregar_em_lotes, combinar, estatisticas_lote
+
+
+@pytest.fixture
+def despesas():
+    rng = np.random.default_rng(42)
+    n = 101
+    razao = rng.choice(["OPERADORA A", " OPERADORA B ", "OPERADORA C", None], n)
+    uf = rng.choice(["SP", "RJ", None], n)
+    valor = rng.normal(1e6, 3e5, n)
+    valor[rng.random(n) < 0.2] = np.nan
+    # grupo com um único valor válido (std NaN) e grupo sem nenhum
+    razao[:3] = ["SO UM", "SO UM", "SEM VALOR"]
+    uf[:3] = ["AM", "AM", "AC"]
+    valor[1:3] = np.nan
+    return pd.DataFrame({"RazaoSocial": razao, "UF": uf, "ValorDespesas": valor})
+
+
+def _groupby_unico(df: pd.DataFrame) -> pd.DataFrame:
+    chaves = {c: df[c].fillna("").str.strip() for c in CHAVES}
+    return (
+        df["ValorDespesas"]
+        .groupby([chaves["RazaoSocial"], chaves["UF"]])
+        .agg(["sum", "mean", "std", "size", "count"])
+        .rename_axis(CHAVES)
+    )
+
+
+@pytest.mark.parametrize("tamanho", [1, 7, 50, 1000])
+def test_combinar_lotes_igual_ao_groupby_unico(despesas, tamanho):
+    acumulado = None
+    for i in range(0, len(despesas), tamanho):
+        parcial = estatisticas_lote(despesas.iloc[i:i + tamanho].copy())
+        acumulado = parcial if acumulado is None else combinar(acumulado, parcial)
+    acumulado = acumulado.sort_index()
+
+    esperado = _groupby_unico(despesas)
+    n = acumulado["n_validos"]
+    assert list(acumulado.index) == list(esperado.index)
+    assert (acumulado["n_linhas"] == esperado["size"]).all()
+    assert (n == esperado["count"]).all()
+    np.testing.assert_allclose(acumulado["soma"], esperado["sum"], rtol=1e-12)
+    np.testing.assert_allclose(acumulado["media"].where(n > 0), esperado["mean"], rtol=1e-12)
+    np.testing.assert_allclose(np.sqrt(acumulado["m2"] / (n - 1)).where(n > 1), esperado["std"], rtol=1e-9)
+
+
+def test_agregar_em_lotes_igual_ao_groupby_unico(despesas, tmp_path):
+    path = tmp_path / "validado.csv"
+    despesas.to_csv(path, index=False, encoding="utf-8-sig")
+
+    agg = agregar_em_lotes(path, linhas_por_lote=13).set_index(CHAVES)
+    esperado = _groupby_unico(pd.read_csv(path, dtype={c: str for c in CHAVES}, encoding="utf-8-sig"))
+
+    assert list(agg.index) == list(esperado.index)
+    # chave NaN vira "" e forma grupo próprio, como no groupby sobre a coluna tratada
+    assert "" in agg.index.get_level_values("RazaoSocial")
+    assert "" in agg.index.get_level_values("UF")
+    np.testing.assert_allclose(agg["total_despesas"], esperado["sum"], rtol=1e-12)
+    np.testing.assert_allclose(agg["media_trimestral"], esperado["mean"], rtol=1e-12)
+    np.testing.assert_allclose(agg["desvio_padrao"], esperado["std"], rtol=1e-9)
+    assert (agg["n_linhas"] == esperado["size"]).all()
+    assert (agg["n_validos"] == esperado["count"]).all()
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+import cache_excel
+
+
+@pytest.fixture
+def planilha(tmp_path, monkeypatch):
+    path = tmp_path / "1T2025.xlsx"
+    pd.DataFrame({"REG_ANS": ["123", "456"], "VL_SALDO_FINAL": ["10,5", None]}).to_excel(path, index=False)
+    monkeypatch.setattr(cache_excel, "HABILITADO", True)
+    monkeypatch.setattr(
+        cache_excel, "caminho_cache", lambda p, motor: tmp_path / "cache" / f"{p.stem}.parquet"
+    )
+    return path
+
+
+def test_falha_ao_gravar_cache_devolve_a_planilha(planilha, monkeypatch):
+    def sem_espaco(df, destino):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(cache_excel, "_gravar", sem_espaco)
+    info = {}
+    df = cache_excel.ler_excel(planilha, info)
+    assert df["REG_ANS"].tolist() == ["123", "456"]
+    assert info["cache"] == "falha_gravar"
+
+
+def test_cache_corrompido_relê_a_planilha(planilha):
+    esperado = cache_excel.ler_excel(planilha)
+    cache = cache_excel.caminho_cache(planilha, None)
+    cache.write_bytes(b"nao e parquet")
+
+    info = {}
+    df = cache_excel.ler_excel(planilha, info)
+    assert info["cache"] == "miss"
+    pd.testing.assert_frame_equal(df, esperado)
+    # e o cache foi regravado
+    assert cache_excel.ler_excel(planilha, info) is not None and info["cache"] == "hit"
@@ -0,0 +1,42 @@
+import struct
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from carga_postgres import PGCOPY_HEADER, PGCOPY_TRAILER, _bin_numeric, _lote_binario
+
+
+def _numeric(weight, sign, dscale, *digitos):
+    # (ndigits, weight, sign, dscale, dígitos em base 10000), como o numeric_send
+    return struct.pack(f"!hhHh{len(digitos)}H", len(digitos), weight, sign, dscale, *digitos)
+
+
+@pytest.mark.parametrize(
+    "valor, esperado",
+    [
+        (0, _numeric(0, 0x0000, 0)),
+        (0.0, _numeric(0, 0x0000, 1)),
+        (Decimal("-12.5"), _numeric(0, 0x4000, 1, 12, 5000)),
+        (-1234567.891, _numeric(1, 0x4000, 3, 123, 4567, 8910)),
+        (0.01, _numeric(-1, 0x0000, 2, 100)),
+        (1.234e-05, _numeric(-2, 0x0000, 8, 1234)),
+        (123456789, _numeric(2, 0x0000, 0, 1, 2345, 6789)),
+        (100000000, _numeric(2, 0x0000, 0, 1)),
+        (Decimal("-0.0"), _numeric(0, 0x0000, 1)),
+        (Decimal("NaN"), _numeric(0, 0xC000, 0)),
+    ],
+)
+def test_bin_numeric_formato_do_postgres(valor, esperado):
+    assert _bin_numeric(valor) == esperado
+
+
+def test_lote_binario_nulos_e_campos():
+    df = pd.DataFrame({"id": [7, 8], "nome": ["á", None], "valor": [float("nan"), 2.5]})
+    buf = _lote_binario(df, {"id": "int4", "valor": "numeric"}).getvalue()
+
+    nulo = struct.pack("!i", -1)
+    linha1 = struct.pack("!hii", 3, 4, 7) + struct.pack("!i", 2) + "á".encode() + nulo
+    valor = _numeric(0, 0x0000, 1, 2, 5000)
+    linha2 = struct.pack("!hii", 3, 4, 8) + nulo + struct.pack("!i", len(valor)) + valor
+    assert buf == PGCOPY_HEADER + linha1 + linha2 + PGCOPY_TRAILER
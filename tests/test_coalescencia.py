@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.app.coalescencia import SingleFlight
+
+N = 8
+CHAVE = ("rota", (("x", 1),))
+
+
+def _esperar(condicao, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            raise TimeoutError("condição não atingida")
+        time.sleep(0.001)
+
+
+def _simultaneas(sf: SingleFlight, fn, liberar: threading.Event):
+    """N threads chamam executar juntas; fn só termina quando todas já estão esperando."""
+    barreira = threading.Barrier(N)
+
+    def chamar():
+        barreira.wait()
+        try:
+            return sf.executar(CHAVE, fn)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=N) as ex:
+        futuros = [ex.submit(chamar) for _ in range(N)]
+        _esperar(lambda: sf.compartilhadas["rota"] == N - 1)
+        liberar.set()
+        return [f.result(timeout=5) for f in futuros]
+
+
+def test_chamadas_simultaneas_executam_uma_vez():
+    sf = SingleFlight()
+    liberar = threading.Event()
+    chamadas = []
+
+    def fn():
+        chamadas.append(threading.get_ident())
+        liberar.wait(5)
+        return {"valor": 42}
+
+    resultados = _simultaneas(sf, fn, liberar)
+
+    assert len(chamadas) == 1
+    assert all(r is resultados[0] for r in resultados)
+    assert sf.executadas["rota"] == 1
+    assert sf.compartilhadas["rota"] == N - 1
+    assert sf.como_dict()["em_andamento"] == 0
+
+
+def test_excecao_chega_a_todos_e_a_chave_e_liberada():
+    sf = SingleFlight()
+    liberar = threading.Event()
+    chamadas = []
+
+    def falha():
+        chamadas.append(1)
+        liberar.wait(5)
+        raise ValueError("banco fora")
+
+    resultados = _simultaneas(sf, falha, liberar)
+
+    assert len(chamadas) == 1
+    assert all(isinstance(r, ValueError) and str(r) == "banco fora" for r in resultados)
+
+    # não é cache: terminada (mesmo com erro), a próxima chamada executa de novo
+    assert sf.executar(CHAVE, lambda: "ok") == "ok"
+    assert sf.executadas["rota"] == 2
+    with pytest.raises(KeyError):
+        sf.executar(CHAVE, lambda: {}["x"])
+    assert sf.executadas["rota"] == 3
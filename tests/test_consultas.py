@@ -0,0 +1,19 @@
+from backend.app.consultas import _posicional
+
+
+def test_nome_repetido_usa_o_mesmo_parametro():
+    sql, nomes = _posicional("WHERE cnpj ILIKE :s OR razao_social ILIKE :s")
+    assert sql == "WHERE cnpj ILIKE $1 OR razao_social ILIKE $1"
+    assert nomes == ["s"]
+
+
+def test_cast_com_dois_pontos_nao_e_parametro():
+    sql, nomes = _posicional("SELECT SUM(v)::NUMERIC(18,2), :ano::int AS a WHERE t = :tri")
+    assert sql == "SELECT SUM(v)::NUMERIC(18,2), $1::int AS a WHERE t = $2"
+    assert nomes == ["ano", "tri"]
+
+
+def test_nome_prefixo_de_outro():
+    sql, nomes = _posicional("LIMIT :limit OFFSET :offset WHERE x >= :total_min AND y <= :total AND :limit > 0")
+    assert sql == "LIMIT $1 OFFSET $2 WHERE x >= $3 AND y <= $4 AND $1 > 0"
+    assert nomes == ["limit", "offset", "total_min", "total"]
@@ -0,0 +1,16 @@
+import argparse
+
+import pytest
+
+from download_ans import parse_trimestre
+
+
+@pytest.mark.parametrize("valor", ["2025T1", "2025t1", "2025_T1", " 2025T1 "])
+def test_parse_trimestre_aceita_as_grafias(valor):
+    assert parse_trimestre(valor) == (2025, 1)
+
+
+@pytest.mark.parametrize("valor", ["2025T5", "2025", "T1", "25T1", "2025T1x"])
+def test_parse_trimestre_rejeita_invalido(valor):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_trimestre(valor)
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+from backend.app import perfil as perfil_mod
+from backend.app.perfil import Perfil
+
+
+def _amostrador_lento(segundos: float) -> threading.Thread:
+    # thread que não atende o _parar (ex.: presa esperando o GIL)
+    return threading.Thread(target=time.sleep, args=(segundos,), daemon=True)
+
+
+async def _ticks_durante(coro) -> int:
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    tarefa = asyncio.create_task(ticker())
+    try:
+        await coro
+    finally:
+        tarefa.cancel()
+    return ticks
+
+
+def test_encerrar_nao_trava_o_event_loop():
+    p = Perfil("GET", "/api/x")
+    p._amostrador = _amostrador_lento(0.3)
+    p.iniciar()
+
+    ticks = asyncio.run(_ticks_durante(p.encerrar(200)))
+
+    assert ticks >= 10
+    assert not p._amostrador.is_alive()
+    assert p.status == 200
+    assert p.total_ms < 300
+
+
+def test_encerrar_respeita_o_timeout(monkeypatch):
+    monkeypatch.setattr(perfil_mod, "ENCERRAR_TIMEOUT_S", 0.1)
+    p = Perfil("GET", "/api/x")
+    p._amostrador = _amostrador_lento(2)
+    p.iniciar()
+
+    inicio = time.perf_counter()
+    asyncio.run(p.encerrar(500))
+
+    assert time.perf_counter() - inicio < 1
+    assert p.status == 500
+
+
+def test_encerrar_para_o_amostrador():
+    p = Perfil("GET", "/api/x")
+    p.iniciar()
+    asyncio.run(p.encerrar(200))
+    assert not p._amostrador.is_alive()
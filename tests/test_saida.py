@@ -0,0 +1,32 @@
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from saida import escrever_csv_zip
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"CNPJ": rng.integers(10**13, 10**14, 20_000).astype(str), "Valor": rng.random(20_000)})
+
+
+def test_nivel_muda_o_tamanho_do_zip(tmp_path, df):
+    tamanhos = {}
+    for nivel in (1, 9):
+        r = escrever_csv_zip(df, tmp_path / "saida.csv", tmp_path / f"saida_{nivel}.zip", nivel=nivel, paralelo=False)
+        tamanhos[nivel] = r["bytes_zip"]
+    assert tamanhos[1] > tamanhos[9]
+
+
+def test_zip_tem_o_mesmo_conteudo_do_csv(tmp_path, df):
+    csv, zp = tmp_path / "saida.csv", tmp_path / "saida.zip"
+    escrever_csv_zip(df, csv, zp, paralelo=True, linhas_por_bloco=3_000)
+
+    esperado = df.to_csv(index=False).encode("utf-8-sig")
+    assert csv.read_bytes() == esperado
+    with zipfile.ZipFile(zp) as zf:
+        assert zf.namelist() == ["saida.csv"]
+        assert zf.read("saida.csv") == esperado
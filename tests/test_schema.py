@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from schema import DATASETS, escrever_csv, ler_csv, tipar
+
+CSV = (
+    "CNPJ,RazaoSocial,RegistroANS,Trimestre,Ano,ValorDespesas\n"
+    "00123456000199,OPERADORA A,000477,1,2025,1234.5600000000002\n"
+    "00123456000199,OPERADORA A,000477,2,2025,\n"
+    "98765432000110,,310000,,2024,-1010178.7042252365\n"
+)
+
+
+@pytest.fixture
+def consolidado(tmp_path):
+    path = tmp_path / "consolidado.csv"
+    path.write_text(CSV, encoding="utf-8-sig")
+    return path
+
+
+@pytest.mark.parametrize("dataset", ["consolidado", "enriquecido"])
+def test_ler_csv_usa_os_dtypes_declarados(consolidado, dataset):
+    df = ler_csv(consolidado, dataset)
+
+    for col, tipo in DATASETS[dataset].items():
+        assert str(df[col].dtype) == ("object" if tipo is str else tipo), col
+    # chaves continuam texto (zeros à esquerda) e período vazio vira <NA>
+    assert df["CNPJ"].astype(str).iloc[0] == "00123456000199"
+    assert df["RegistroANS"].astype(str).iloc[0] == "000477"
+    assert df["Trimestre"].isna().tolist() == [False, False, True]
+    # parser exato: o float lido é o mesmo que o Python lê do texto
+    assert df["ValorDespesas"].iloc[0] == 1234.5600000000002
+    assert df["ValorDespesas"].iloc[2] == -1010178.7042252365
+
+
+@pytest.mark.parametrize("dataset", ["consolidado", "enriquecido"])
+def test_tipar_e_escrever_csv_nao_mudam_valores(consolidado, tmp_path, dataset):
+    original = ler_csv(consolidado, dataset)
+    # colunas fora de ordem e uma extra: tipar seleciona e ordena pelo schema
+    embaralhado = original[list(reversed(original.columns))].assign(EXTRA="x")
+
+    saida = escrever_csv(embaralhado, tmp_path / "saida.csv", dataset)
+    relido = ler_csv(saida, dataset)
+
+    assert list(relido.columns) == list(DATASETS[dataset])
+    pd.testing.assert_frame_equal(relido, tipar(original, dataset), check_categorical=False)
+    pd.testing.assert_frame_equal(relido, original, check_categorical=False)